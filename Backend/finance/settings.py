@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +52,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'ledger.middleware.RequestMetricsMiddleware',
+    'ledger.middleware.ProfilingMiddleware',
+    'ledger.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,13 +88,65 @@ WSGI_APPLICATION = 'finance.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite connection profiles, picked with LEDGER_DATABASE_PROFILE. 'production'
+# switches to WAL so readers never block the single writer, takes the write
+# lock when a transaction starts (instead of failing to upgrade a read lock
+# mid-transaction), waits up to 20s for a busy database and keeps connections
+# open between requests.
+LEDGER_DATABASE_PROFILES = {
+    'development': {
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {},
+    },
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'  # Durable across crashes under WAL, only the last commits can be lost on power loss
+                'PRAGMA cache_size=-65536;'  # 64 MiB page cache per connection
+                'PRAGMA mmap_size=268435456;'  # 256 MiB
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    },
+}
+LEDGER_DATABASE_PROFILE = os.environ.get('LEDGER_DATABASE_PROFILE', 'development')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # File-backed test database so tests can exercise concurrent writers
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+        **LEDGER_DATABASE_PROFILES[LEDGER_DATABASE_PROFILE],
     }
 }
 
+# Optional read replica for ledger reads, e.g. LEDGER_REPLICA_DATABASE=replica.sqlite3
+# kept up to date with `manage.py sync_replica --interval 1`. See ledger/routers.py.
+LEDGER_READ_REPLICA = None
+if os.environ.get('LEDGER_REPLICA_DATABASE'):
+    LEDGER_READ_REPLICA = 'replica'
+    DATABASES[LEDGER_READ_REPLICA] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LEDGER_REPLICA_DATABASE'],
+        # Tests read and write one database
+        'TEST': {
+            'MIRROR': 'default',
+        },
+        **LEDGER_DATABASE_PROFILES[LEDGER_DATABASE_PROFILE],
+    }
+LEDGER_REPLICA_STICKY_COOKIE = 'ledger_primary'
+LEDGER_REPLICA_STICKY_SECONDS = 10  # Reads stay on the primary this long after a client writes; keep above the replication lag
+
+DATABASE_ROUTERS = ['ledger.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,6 +196,7 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -145,4 +204,59 @@ CORS_ALLOW_METHODS = [
     'PATCH',
     'POST',
     'PUT',
-]
\ No newline at end of file
+]
+
+# Django REST framework
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'ledger.renderers.LedgerJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Ledger settings
+LEDGER_BULK_BATCH_SIZE = 1000  # Rows per INSERT when bulk posting transactions
+LEDGER_PAGE_SIZE = 100  # Default rows per page for transaction history and API lists
+LEDGER_MAX_PAGE_SIZE = 1000
+LEDGER_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # Clients allowed to scrape /metrics/
+LEDGER_DASHBOARD_ROWS = 50  # Latest transactions listed on the index page
+LEDGER_JSON_BACKEND = 'orjson'  # 'orjson' (when installed) or 'json' for the standard library
+LEDGER_EVENTS_QUEUE_SIZE = 1000  # Events buffered per stream before a slow client is disconnected
+LEDGER_EVENTS_KEEPALIVE = 15  # Seconds between keepalive comments on an idle event stream
+LEDGER_LOCKED_RETRIES = 3  # Extra attempts at a post that failed with "database is locked"
+LEDGER_LOCKED_RETRY_DELAY = 0.05  # Seconds before the first retry, doubled on each attempt
+LEDGER_COUNTER_STRIPES = 16  # Rows the global transaction counter is split over, so posts don't share one row lock
+LEDGER_ARCHIVE_AFTER_DAYS = 730  # archive_transactions moves transactions older than this out of the hot table
+LEDGER_ARCHIVE_BATCH_SIZE = 1000  # Rows moved per database transaction when archiving
+LEDGER_IDEMPOTENCY_HEADER = 'Idempotency-Key'  # Writes sent with this header are posted at most once per key
+LEDGER_IDEMPOTENCY_TTL = 24 * 60 * 60  # Seconds a key's stored response is replayed before it can be reused
+
+# Opt-in request profiling, viewable by staff at /profiles/
+LEDGER_PROFILING_ENABLED = False
+LEDGER_PROFILING_HEADER = 'X-Ledger-Profile'  # Send "X-Ledger-Profile: 1" to profile a request
+LEDGER_PROFILING_SAMPLE_RATE = 0.0  # Fraction of ledger requests profiled without the header
+LEDGER_PROFILING_MAX_PER_MINUTE = 10
+LEDGER_PROFILES_KEPT = 20
+
+# Cache for the account list and dashboard reads, invalidated on every ledger write.
+# Local memory is per process; use the file backend to share one cache between
+# several worker processes on the same host.
+LEDGER_CACHE_ALIAS = 'ledger'
+LEDGER_CACHE_BACKEND = os.environ.get('LEDGER_CACHE_BACKEND', 'locmem')  # 'locmem' or 'file'
+LEDGER_CACHE_TIMEOUT = 300  # Seconds
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    LEDGER_CACHE_ALIAS: {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ledger',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('LEDGER_CACHE_DIR', BASE_DIR / 'ledger_cache'),
+        },
+    }[LEDGER_CACHE_BACKEND],
+}
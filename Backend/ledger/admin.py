@@ -1,8 +1,64 @@
 from django.contrib import admin
-from .models import User, Account, Transaction
+from .models import (
+    User, Account, Transaction, ArchivedTransaction, OpeningBalance, BalanceSnapshot, ReconciliationCheckpoint,
+    LedgerCounter, JournalEntry, JournalCheckpoint, IdempotencyKey,
+)
+from .services import amend_transaction, delete_transaction, post_transaction, save_account_fields
 
 # Register your models here.
 
 admin.site.register(User)
-admin.site.register(Account)
-admin.site.register(Transaction)
+admin.site.register(ReconciliationCheckpoint)
+admin.site.register(IdempotencyKey)
+
+
+@admin.register(Account)
+class AccountAdmin(admin.ModelAdmin):
+    """Balances and counters only move through the posting services, so they are read-only here."""
+    readonly_fields = ('balance', 'transaction_count', 'version', 'modified_at')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.save()
+            return
+        # authorized_users is saved by save_related, and bumps the version itself
+        fields = [name for name in form.changed_data if not obj._meta.get_field(name).many_to_many]
+        save_account_fields(obj, fields)
+
+
+@admin.register(Transaction)
+class TransactionAdmin(admin.ModelAdmin):
+    """Saves and deletes go through the posting services, so balances, snapshots, counters and the journal follow."""
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            amend_transaction(obj, **{name: form.cleaned_data[name] for name in form.changed_data})
+        else:
+            posted, _ = post_transaction(obj.account, obj.amount, obj.description, obj.creator, obj.timestamp)
+            obj.pk = posted.pk
+
+    def delete_model(self, request, obj):
+        delete_transaction(obj)
+
+    def delete_queryset(self, request, queryset):
+        for tx in queryset:
+            delete_transaction(tx)
+
+
+@admin.register(ArchivedTransaction, OpeningBalance, BalanceSnapshot, JournalEntry, JournalCheckpoint)
+class MaintainedAdmin(admin.ModelAdmin):
+    """Rows the ledger writes itself: viewable, and deleted along with their account, but never added or edited here."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerCounter)
+class LedgerCounterAdmin(MaintainedAdmin):
+    """Read-only: run repair_counters to fix a drifted counter."""
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class LedgerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ledger'
+
+    def ready(self):
+        from . import cache, conditional, counters, events, idempotency
+        cache.connect_signals()
+        conditional.connect_signals()
+        counters.connect_signals()
+        events.connect_signals()
+        idempotency.connect_signals()
@@ -0,0 +1,110 @@
+"""Archive of old transactions.
+
+archive_transactions moves transactions older than a horizon out of the hot
+Transaction table into ArchivedTransaction, keeping their ids, and rolls
+them into each account's OpeningBalance. Balances, counters and snapshots
+cover the whole ledger, so none of them change. Readers that go back in time
+(history pages and exports) only query the archive when the rows they need
+can be older than an account's archived_through.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ArchivedTransaction, OpeningBalance, Transaction
+from .pagination import keyset_slice
+
+ARCHIVE_FIELDS = ('id', 'account_id', 'creator_id', 'amount', 'timestamp', 'description')
+
+
+def default_horizon():
+    """Return the moment before which transactions are archived, LEDGER_ARCHIVE_AFTER_DAYS ago."""
+    return timezone.now() - timedelta(days=settings.LEDGER_ARCHIVE_AFTER_DAYS)
+
+
+def archive_transactions(before=None, batch_size=None):
+    """Move transactions older than before into the archive and return how many were moved.
+
+    Works through the oldest ids in batches of batch_size (default
+    settings.LEDGER_ARCHIVE_BATCH_SIZE), each batch in its own database
+    transaction, so posts are never held up for long.
+    """
+    before = before or default_horizon()
+    batch_size = batch_size or settings.LEDGER_ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Transaction.objects.select_for_update().filter(timestamp__lt=before)
+                .order_by('id').values_list(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return moved
+            ArchivedTransaction.objects.bulk_create(
+                [ArchivedTransaction(**dict(zip(ARCHIVE_FIELDS, row))) for row in rows], batch_size=batch_size
+            )
+            _roll_up(rows, before)
+            Transaction.objects.filter(id__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
+
+
+def _roll_up(rows, before):
+    """Add archived rows to their accounts' opening balances."""
+    totals = defaultdict(lambda: [Decimal(0), 0])
+    for _, account_id, _, amount, _, _ in rows:
+        totals[account_id][0] += amount
+        totals[account_id][1] += 1
+    existing = {opening.account_id: opening for opening in OpeningBalance.objects.filter(account_id__in=totals)}
+    created = []
+    for account_id, (amount, count) in totals.items():
+        opening = existing.get(account_id)
+        if opening is None:
+            opening = OpeningBalance(account_id=account_id, archived_through=before)
+            created.append(opening)
+        opening.balance += amount
+        opening.transaction_count += count
+        opening.archived_through = max(opening.archived_through, before)
+    OpeningBalance.objects.bulk_update(list(existing.values()), ['balance', 'transaction_count', 'archived_through'])
+    OpeningBalance.objects.bulk_create(created)
+
+
+def archived_through(account_id=None, using=None):
+    """Return the archive horizon of one account, or the latest of any account; None if nothing is archived."""
+    openings = OpeningBalance.objects.using(using)
+    if account_id is not None:
+        openings = openings.filter(account_id=account_id)
+    return openings.aggregate(horizon=Max('archived_through'))['horizon']
+
+
+def history_archive_slice(account, rows, cursor, limit, fields):
+    """Return the archive query that completes a history page, or None when the hot rows suffice.
+
+    rows are the hot rows keyset_slice fetched for the page. The archive is
+    only needed when they run out, or reach back past the account's
+    archived_through. account must have its opening_balance loaded
+    (select_related), so the check itself costs no query.
+    """
+    opening = getattr(account, 'opening_balance', None)
+    if opening is None or (len(rows) > limit and rows[-1].timestamp >= opening.archived_through):
+        return None
+    archived = ArchivedTransaction.objects.filter(account_id=account.pk).values_list(*fields, named=True)
+    return keyset_slice(archived, cursor, limit)
+
+
+def merge_history(rows, archived, limit):
+    """Merge hot and archived rows, both newest first, keeping the limit + 1 newest for split_page."""
+    merged = heapq.merge(rows, archived, key=lambda row: (row.timestamp, row.id), reverse=True)
+    return list(merged)[:limit + 1]
+
+
+def merge_export(hot, archived, account_id):
+    """Merge hot and archived export rows in the order export_rows produces them."""
+    if account_id is not None:
+        return heapq.merge(archived, hot, key=lambda row: (row[4], row[0]))
+    return heapq.merge(archived, hot, key=lambda row: row[0])
@@ -0,0 +1,118 @@
+"""Async versions of the ledger read endpoints, for ASGI deployments.
+
+They return the same bodies as their synchronous counterparts in views.py
+but query through the async ORM, so under ASGI a request waiting on a slow
+client holds a coroutine rather than a worker thread. Under WSGI they still
+work, run through async_to_sync.
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.utils.urls import replace_query_param
+
+from .archive import history_archive_slice, merge_history
+from .conditional import async_account_condition
+from .events import OVERFLOW, broadcaster
+from .exports import EXPORT_FORMATS, aexport_rows, arender_export, parse_bound
+from .models import Account, Transaction
+from .pagination import get_page_size, keyset_slice, split_page
+from .renderers import LedgerJsonResponse
+from .serializers import AccountSerializer
+from .views import HISTORY_FIELDS, history_payload
+
+
+@async_account_condition
+async def get_transaction_history(request, account_id):
+    """Async get_transaction_history: a page of an account's transactions, newest first."""
+    account = await Account.objects.select_related("opening_balance").filter(pk=account_id).afirst()
+    if account is None:
+        raise Http404
+    cursor, limit = request.GET.get("cursor"), get_page_size(request.GET.get("limit"))
+    transactions = Transaction.objects.filter(account_id=account_id).values_list(*HISTORY_FIELDS, named=True)
+    try:
+        query = keyset_slice(transactions, cursor, limit)
+    except ValueError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e)}, status=400)
+    rows = [row async for row in query]
+    archived = history_archive_slice(account, rows, cursor, limit, HISTORY_FIELDS)
+    if archived is not None:
+        rows = merge_history(rows, [row async for row in archived], limit)
+    page, next_cursor = split_page(rows, limit)
+    return LedgerJsonResponse(history_payload(page, next_cursor))
+
+
+async def accounts(request):
+    """Async /api/accounts/ list: a keyset page of accounts, newest first."""
+    limit = get_page_size(request.GET.get("limit"))
+    try:
+        query = keyset_slice(
+            Account.objects.prefetch_related("authorized_users"), request.GET.get("cursor"), limit, "created_at"
+        )
+    except ValueError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e)}, status=400)
+    page, next_cursor = split_page([account async for account in query], limit, "created_at")
+    next_link = None
+    if next_cursor is not None:
+        next_link = replace_query_param(request.build_absolute_uri(), "cursor", next_cursor)
+    return LedgerJsonResponse({"next": next_link, "results": AccountSerializer(page, many=True).data})
+
+
+async def export_transactions(request):
+    """Async export_transactions: stream CSV or NDJSON, fetching rows as the client reads them."""
+    export_format = request.GET.get("format", "csv")
+    try:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {export_format}")
+        account_id = request.GET.get("account")
+        rows = aexport_rows(
+            account_id=int(account_id) if account_id else None,
+            start=parse_bound(request.GET.get("start")),
+            end=parse_bound(request.GET.get("end"), end=True),
+        )
+    except ValueError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        arender_export(rows, export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+
+async def transaction_events(request):
+    """Stream transactions as server-sent events as they are posted, optionally for one ?account=.
+
+    Needs an ASGI server; a WSGI worker would be held for the life of the stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        return LedgerJsonResponse({"status": "error", "message": "Event streams need an ASGI server."}, status=400)
+    account_id = request.GET.get("account")
+    if account_id is not None:
+        if not account_id.isdigit() or not await Account.objects.filter(pk=account_id).aexists():
+            raise Http404
+        account_id = int(account_id)
+
+    response = StreamingHttpResponse(_event_stream(account_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Stop nginx from buffering the stream
+    return response
+
+
+async def _event_stream(account_id):
+    subscription = broadcaster.subscribe(account_id)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.LEDGER_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is OVERFLOW:
+                return
+            yield event
+    finally:
+        broadcaster.unsubscribe(subscription)
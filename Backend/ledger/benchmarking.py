@@ -0,0 +1,334 @@
+"""Synthetic data and timing helpers for benchmarking the ledger."""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .counters import adjust_transaction_count
+from .journal import open_journals
+from .metrics import percentile
+from .models import Account, BalanceSnapshot, Transaction, User
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Point the default connection at a freshly migrated test database for the block.
+
+    Benchmarks seed large datasets, so they never run against the real
+    database; the scratch copy is destroyed afterwards.
+    """
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+DESCRIPTIONS = (
+    ("Chapter dues", 2500, 15000),
+    ("Venmo transfer", -20000, 20000),
+    ("Cash App payment", -15000, 15000),
+    ("Pizza night", -30000, -2000),
+    ("Event supplies", -50000, -1000),
+    ("Fundraiser proceeds", 5000, 100000),
+    ("Reimbursement", 500, 20000),
+    ("Groceries", -15000, -500),
+)
+
+
+TRANSACTION_COLUMNS = ("account", "creator", "amount", "timestamp", "description")
+SNAPSHOT_COLUMNS = ("account", "period", "period_start", "credits", "debits", "transaction_count")
+
+
+def _insert_rows(cursor, model, fields, rows):
+    """INSERT pre-adapted value tuples with executemany, skipping model instantiation."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    cursor.executemany(f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})", rows)
+
+
+def seed_ledger(users=10, accounts_per_user=2, authorized_users=2, transactions_per_account=500,
+                days=365, seed=0, batch_size=10000):
+    """Generate a synthetic ledger and return its accounts.
+
+    The same arguments and seed always produce the same data. Users,
+    accounts and memberships go through bulk_create; transactions are
+    written with executemany in batches of batch_size, bypassing model
+    instantiation, which is what makes millions of rows practical. Account
+    balances, transaction counters and the daily/monthly snapshots are
+    computed while generating, so the result is consistent without a rebuild;
+    each account's journal opens at its final balance.
+    """
+    rng = random.Random(seed)
+    user_objs = User.objects.bulk_create(
+        (User(name=f"Member {i}", email=f"member{i}@example.com") for i in range(users)), batch_size=batch_size
+    )
+    account_objs = Account.objects.bulk_create(
+        (Account(name=f"{user.name} account {j}", owner=user) for user in user_objs for j in range(accounts_per_user)),
+        batch_size=batch_size,
+    )
+    Membership = Account.authorized_users.through
+    Membership.objects.bulk_create(
+        (
+            Membership(account_id=account.id, user_id=user.id)
+            for account in account_objs
+            for user in rng.sample(user_objs, min(authorized_users, len(user_objs)))
+        ),
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+    # Local midnights, so each transaction's snapshot day is known without a timezone conversion
+    today = timezone.localdate()
+    days_back = [
+        (timezone.make_aware(datetime.combine(day, datetime.min.time())), day)
+        for day in (today - timedelta(days=offset) for offset in range(days))
+    ]
+    user_ids = [user.id for user in user_objs]
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    uniform = rng.random
+
+    snapshots = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        pending = []
+        for account in account_objs:
+            balance = Decimal(0)
+            for _ in range(transactions_per_account):
+                description, low, high = DESCRIPTIONS[int(uniform() * len(DESCRIPTIONS))]
+                amount = Decimal(low + int(uniform() * (high - low + 1))).scaleb(-2)
+                midnight, day = days_back[int(uniform() * days)]
+                timestamp = adapt_datetime(midnight + timedelta(seconds=int(uniform() * 86400)))
+                pending.append((account.id, user_ids[int(uniform() * users)], amount, timestamp, description))
+                balance += amount
+                for key in ((account.id, BalanceSnapshot.DAY, day),
+                            (account.id, BalanceSnapshot.MONTH, day.replace(day=1))):
+                    totals = snapshots.get(key)
+                    if totals is None:
+                        totals = snapshots[key] = [Decimal(0), Decimal(0), 0]
+                    totals[0 if amount >= 0 else 1] += abs(amount)
+                    totals[2] += 1
+                if len(pending) >= batch_size:
+                    _insert_rows(cursor, Transaction, TRANSACTION_COLUMNS, pending)
+                    pending = []
+            account.balance = balance
+            account.transaction_count = transactions_per_account
+        _insert_rows(cursor, Transaction, TRANSACTION_COLUMNS, pending)
+
+        Account.objects.bulk_update(account_objs, ["balance", "transaction_count"], batch_size=batch_size)
+        open_journals({account.id: account.balance for account in account_objs}, batch_size=batch_size)
+        adjust_transaction_count(len(account_objs) * transactions_per_account)
+        rows = [
+            (account_id, period, connection.ops.adapt_datefield_value(period_start), credits, debits, count)
+            for (account_id, period, period_start), (credits, debits, count) in snapshots.items()
+        ]
+        for offset in range(0, len(rows), batch_size):
+            _insert_rows(cursor, BalanceSnapshot, SNAPSHOT_COLUMNS, rows[offset:offset + batch_size])
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return account_objs
+
+
+def time_call(fn, repeat):
+    """Call fn repeat times and return p50/p95/p99/max latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples),
+    }
+
+
+def benchmark_requests(send, requests, warmup=3):
+    """Time requests made by send(i) and return throughput, latency percentiles and query counts.
+
+    send is called with the request number and must return a response;
+    any non-2xx/3xx status fails the benchmark rather than timing errors.
+    """
+    for i in range(warmup):
+        send(i)
+    samples, queries = [], []
+    started = time.perf_counter()
+    for i in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = send(warmup + i)
+            samples.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"Request {i} failed with status {response.status_code}")
+        queries.append(len(captured))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples),
+        "queries_per_request": sum(queries) / len(queries),
+        "max_queries": max(queries),
+    }
+
+
+@contextmanager
+def database_profile(profile):
+    """Apply one of settings.LEDGER_DATABASE_PROFILES to the default connection for the block.
+
+    The settings dict is shared by every thread's connection, so threads
+    started inside the block connect with the profile's options.
+    """
+    settings_dict = connection.settings_dict
+    saved = {key: settings_dict.get(key) for key in ("OPTIONS", "CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+    connections.close_all()
+    settings_dict.update({"CONN_HEALTH_CHECKS": False, **profile})
+    try:
+        yield
+    finally:
+        connections.close_all()
+        settings_dict.update(saved)
+
+
+def write_contention(send_write, send_read, writers, posts_per_writer, readers=0):
+    """Post from writers threads at once while readers threads keep reading, and time it.
+
+    send_write(i) returns whether the write succeeded, so failed writes
+    (such as "database is locked" errors) are counted rather than raised.
+    Readers run until the last writer finishes. Each thread closes its own
+    connection when done.
+    """
+    done = threading.Event()
+
+    def write(worker):
+        samples, errors = [], 0
+        try:
+            for i in range(posts_per_writer):
+                started = time.perf_counter()
+                if not send_write(worker * posts_per_writer + i):
+                    errors += 1
+                samples.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        return samples, errors
+
+    def read(worker):
+        reads = 0
+        try:
+            while not done.is_set():
+                send_read(reads)
+                reads += 1
+        finally:
+            connection.close()
+        return reads
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers + readers) as executor:
+        reading = [executor.submit(read, worker) for worker in range(readers)]
+        results = list(executor.map(write, range(writers)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        reads = sum(future.result() for future in reading)
+
+    latencies = [seconds * 1000 for samples, _ in results for seconds in samples]
+    return {
+        "writes": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "writes_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "reads_per_second": reads / elapsed if elapsed else 0.0,
+    }
+
+
+def _load_summary(latencies, elapsed, peak_threads):
+    latencies = [seconds * 1000 for seconds in latencies]
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies, default=0.0),
+        "peak_threads": peak_threads,
+    }
+
+
+def load_test_wsgi(path, clients, workers=8, read_delay=0.0):
+    """Send clients simultaneous GETs for path through the WSGI handler on a pool of workers threads.
+
+    Like the other load test, requests come from the test client's
+    "testserver" host, which must be allowed. This is how a threaded WSGI
+    server behaves: each worker is tied up until
+    its client has read the whole response, and read_delay seconds per
+    response chunk simulates a slow client. Latency includes time spent
+    queued for a worker.
+    """
+    peak = threading.active_count()
+
+    def request(submitted):
+        nonlocal peak
+        response = Client().get(path)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} failed with status {response.status_code}")
+        peak = max(peak, threading.active_count())
+        chunks = response.streaming_content if response.streaming else [response.content]
+        for _ in chunks:
+            time.sleep(read_delay)
+        return time.perf_counter() - submitted
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(request, [time.perf_counter()] * clients))
+    return _load_summary(latencies, time.perf_counter() - started, peak)
+
+
+def load_test_asgi(path, clients, read_delay=0.0):
+    """Send clients simultaneous GETs for path through the ASGI handler on one event loop.
+
+    Slow reads are awaited, so they hold a coroutine rather than a thread;
+    database work still runs on a thread, as the async ORM always does.
+    """
+    peak = threading.active_count()
+
+    async def request(client):
+        nonlocal peak
+        submitted = time.perf_counter()
+        # ASGIHandler gives each request its own thread for sync work; the test client does not
+        async with ThreadSensitiveContext():
+            response = await client.get(path)
+            peak = max(peak, threading.active_count())
+            if response.status_code >= 400:
+                raise RuntimeError(f"{path} failed with status {response.status_code}")
+            if response.streaming:
+                async for _ in response.streaming_content:
+                    await asyncio.sleep(read_delay)
+            else:
+                await asyncio.sleep(read_delay)
+        return time.perf_counter() - submitted
+
+    async def run():
+        client = AsyncClient()
+        try:
+            return await asyncio.gather(*(request(client) for _ in range(clients)))
+        finally:
+            await sync_to_async(connections.close_all)()
+
+    started = time.perf_counter()
+    latencies = asyncio.run(run())
+    return _load_summary(latencies, time.perf_counter() - started, peak)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import Account, Transaction
+from .routers import use_primary
+from .signals import balance_changed, transactions_posted
+
+GENERATION_KEY = 'ledger:generation'
+_MISSING = object()
+
+
+class CacheStats:
+    """Hit and miss counts per cached read."""
+
+    def __init__(self):
+        self._counts = defaultdict(lambda: {'hit': 0, 'miss': 0})
+        self._lock = threading.Lock()
+
+    def record(self, name, result):
+        with self._lock:
+            self._counts[name][result] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_stats = CacheStats()
+
+
+def ledger_cache():
+    return caches[settings.LEDGER_CACHE_ALIAS]
+
+
+def generation():
+    """Return the current cache generation; every ledger write moves to a new one.
+
+    The first value is a timestamp rather than 0, so if the key is ever
+    evicted the generation cannot fall back to one that has entries cached.
+    """
+    return ledger_cache().get_or_set(GENERATION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate(**kwargs):
+    """Start a new generation, orphaning everything cached so far."""
+    cache = ledger_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_on_commit(**kwargs):
+    """Invalidate once the writer's transaction commits.
+
+    Invalidating before the commit would let a concurrent read fill the new
+    generation with the data the write is about to replace.
+    """
+    transaction.on_commit(invalidate)
+
+
+def cached(name, build, *parts):
+    """Return the cached value for name and parts, computing it with build() on a miss.
+
+    build() always reads the primary: a value built from a lagging replica
+    would be served until the next write.
+    """
+    cache = ledger_cache()
+    key = ':'.join(['ledger', str(generation()), name, *map(str, parts)])
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        cache_stats.record(name, 'hit')
+        return value
+    cache_stats.record(name, 'miss')
+    with use_primary():
+        value = build()
+    cache.set(key, value, settings.LEDGER_CACHE_TIMEOUT)
+    return value
+
+
+def connect_signals():
+    transactions_posted.connect(invalidate, dispatch_uid='ledger_cache_transactions_posted')
+    balance_changed.connect(invalidate, dispatch_uid='ledger_cache_balance_changed')
+    # Model signals fire inside the writer's transaction
+    post_save.connect(invalidate_on_commit, sender=Account, dispatch_uid='ledger_cache_account_saved')
+    post_delete.connect(invalidate_on_commit, sender=Account, dispatch_uid='ledger_cache_account_deleted')
+    m2m_changed.connect(
+        invalidate_on_commit, sender=Account.authorized_users.through,
+        dispatch_uid='ledger_cache_account_users_changed',
+    )
+    post_save.connect(invalidate_on_commit, sender=Transaction, dispatch_uid='ledger_cache_transaction_saved')
@@ -0,0 +1,102 @@
+"""ETag and Last-Modified validators for ledger reads.
+
+Every write to an account bumps its version and modified_at in the same
+UPDATE that changes it, so validators are computed from the accounts table
+alone. A poll that finds nothing changed gets a 304 without running the
+view, and without touching the transaction table.
+"""
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Sum
+from django.db.models.signals import m2m_changed
+from django.views.decorators.http import condition
+
+from .cache import cached
+from .models import Account, account_changed
+
+
+def _variant(request):
+    """Distinguish representations of the same resource: query string and negotiated type."""
+    key = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def _account_state(request, account_id):
+    """Return (version, modified_at) for an account, read at most once per request; None if there is none."""
+    try:
+        account_id = int(account_id)
+    except (TypeError, ValueError):
+        return None  # The API's pk comes straight from the URL; the view answers 404
+    states = request.__dict__.setdefault('_ledger_account_states', {})
+    if account_id not in states:
+        states[account_id] = Account.objects.filter(pk=account_id).values_list('version', 'modified_at').first()
+    return states[account_id]
+
+
+def account_etag(request, account_id=None, pk=None, **kwargs):
+    state = _account_state(request, account_id or pk)
+    if state is None:
+        return None  # Let the view answer 404
+    return f"{account_id or pk}-{state[0]}-{state[1].timestamp()}-{_variant(request)}"
+
+
+def account_last_modified(request, account_id=None, pk=None, **kwargs):
+    state = _account_state(request, account_id or pk)
+    return state[1] if state else None
+
+
+def ledger_etag(request, *args, **kwargs):
+    """Validator for reads spanning every account: changes with any account write, create or delete.
+
+    The aggregate is cached alongside the responses it validates, so it is
+    invalidated by the same writes.
+    """
+    state = cached('ledger-state', lambda: Account.objects.aggregate(
+        count=Count('id'), versions=Sum('version'), modified=Max('modified_at'),
+    ))
+    modified = state['modified'].timestamp() if state['modified'] else 0
+    return f"{state['count']}-{state['versions'] or 0}-{modified}-{_variant(request)}"
+
+
+# Views over one account (taking account_id or pk) and over the whole ledger
+account_condition = condition(etag_func=account_etag, last_modified_func=account_last_modified)
+ledger_condition = condition(etag_func=ledger_etag)
+
+
+def async_account_condition(view):
+    """account_condition for async views.
+
+    condition() calls the validators synchronously, so the account's state
+    is read on the database thread first; the validators then find it in
+    the per-request cache.
+    """
+    conditioned = account_condition(view)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        await sync_to_async(_account_state)(request, kwargs.get('account_id') or kwargs.get('pk'))
+        return await conditioned(request, *args, **kwargs)
+    return wrapper
+
+
+def bump_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Changing authorized_users changes the account's API representation."""
+    if not reverse:
+        account_ids = [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else []
+    elif action in ('post_add', 'post_remove'):
+        account_ids = pk_set
+    elif action == 'pre_clear':
+        # Afterwards there is no way to tell which accounts the user was removed from
+        account_ids = list(instance.authorized_accounts.values_list('pk', flat=True))
+    else:
+        account_ids = []
+    if account_ids:
+        Account.objects.filter(pk__in=account_ids).update(**account_changed())
+
+
+def connect_signals():
+    m2m_changed.connect(
+        bump_membership, sender=Account.authorized_users.through, dispatch_uid='ledger_conditional_membership'
+    )
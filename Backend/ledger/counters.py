@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_delete
+
+from .models import Account, ArchivedTransaction, LedgerCounter, OpeningBalance, Transaction, account_changed
+from .signals import balance_changed
+
+TRANSACTION_COUNT = 'transactions'
+
+
+def _stripe_name(account_id):
+    stripe = account_id % settings.LEDGER_COUNTER_STRIPES
+    # Stripe 0 keeps the counter's original name, so ledgers counted before striping carry over
+    return TRANSACTION_COUNT if stripe == 0 else f'{TRANSACTION_COUNT}.{stripe}'
+
+
+def _stripes():
+    return LedgerCounter.objects.filter(Q(name=TRANSACTION_COUNT) | Q(name__startswith=f'{TRANSACTION_COUNT}.'))
+
+
+def count_transactions():
+    """Count the ledger's transactions, hot and archived, by scanning both tables."""
+    return Transaction.objects.count() + ArchivedTransaction.objects.count()
+
+
+def stored_transaction_count():
+    """Return the sum of the counter's stripes, or None if the ledger has never been counted."""
+    totals = _stripes().aggregate(stripes=Count('id'), value=Sum('value'))
+    return totals['value'] if totals['stripes'] else None
+
+
+def transaction_count():
+    """Return the number of transactions in the ledger without scanning it."""
+    value = stored_transaction_count()
+    return count_transactions() if value is None else value
+
+
+def adjust_transaction_count(delta, account_id=0):
+    """Add delta to the global transaction counter; call after the rows are written or deleted.
+
+    The counter is split over settings.LEDGER_COUNTER_STRIPES rows, picked
+    by account_id and summed on read, so posts to different accounts do not
+    all queue on one row lock. Posts to one account share a stripe, but
+    they already serialize on the account's row.
+    """
+    name = _stripe_name(account_id)
+    if LedgerCounter.objects.filter(name=name).update(value=F('value') + delta):
+        return
+    if not LedgerCounter.objects.filter(name=TRANSACTION_COUNT).exists():
+        # First use: start from a full count, which already includes this change
+        LedgerCounter.objects.get_or_create(name=TRANSACTION_COUNT, defaults={'value': count_transactions()})
+        return
+    _, created = LedgerCounter.objects.get_or_create(name=name, defaults={'value': delta})
+    if not created:
+        LedgerCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def account_transaction_counts():
+    """Expression for an account's transaction count according to the transaction table and its archive."""
+    counts = (
+        Transaction.objects.filter(account=OuterRef('pk'))
+        .order_by()
+        .values('account')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    archived = OpeningBalance.objects.filter(account=OuterRef('pk')).values('transaction_count')
+    return Coalesce(Subquery(counts), Value(0)) + Coalesce(Subquery(archived), Value(0))
+
+
+def repair_counters(dry_run=False):
+    """Compare the counters with the transaction table and archive and fix any that are wrong.
+
+    Returns a list of (counter, stored, actual) for every mismatch. Drifted
+    account counters are reset by an UPDATE that recounts in the database,
+    like the balance repair in reconciliation.
+    """
+    drift, drifted_accounts = [], []
+    with transaction.atomic():
+        rows = (
+            Account.objects.order_by()
+            .values_list('id', 'transaction_count', 'opening_balance__transaction_count')
+            .annotate(actual=Count('transaction'))
+        )
+        for account_id, stored, archived, actual in rows.iterator():
+            actual += archived or 0
+            if stored != actual:
+                drift.append((f'account {account_id}', stored, actual))
+                drifted_accounts.append(account_id)
+        stored = stored_transaction_count()
+        actual = count_transactions()
+        if stored != actual:
+            drift.append((TRANSACTION_COUNT, stored, actual))
+
+        if not dry_run:
+            if drifted_accounts:
+                Account.objects.filter(id__in=drifted_accounts).update(
+                    transaction_count=account_transaction_counts(), **account_changed()
+                )
+            if stored != actual:
+                _stripes().exclude(name=TRANSACTION_COUNT).update(value=0)
+                LedgerCounter.objects.update_or_create(name=TRANSACTION_COUNT, defaults={'value': actual})
+            if drift:
+                transaction.on_commit(lambda: balance_changed.send(sender=Account, account_ids=drifted_accounts))
+    return drift
+
+
+def forget_account_transactions(sender, instance, **kwargs):
+    """Take a deleted account's cascaded transactions off the global counter."""
+    archived = OpeningBalance.objects.filter(account=instance).values_list('transaction_count', flat=True).first()
+    adjust_transaction_count(
+        -(Transaction.objects.filter(account=instance).count() + (archived or 0)), account_id=instance.pk
+    )
+
+
+def connect_signals():
+    pre_delete.connect(forget_account_transactions, sender=Account, dispatch_uid='ledger_counters_account_deleted')
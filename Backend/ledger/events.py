@@ -0,0 +1,96 @@
+"""In-process fan-out of posted transactions to server-sent event streams.
+
+Postings send transactions_posted once they commit; the receiver here
+encodes each transaction once and hands it to every subscribed stream's
+queue, so subscribers cost no database queries. Streams live on an event
+loop (ASGI) while posts usually happen on worker threads, hence
+call_soon_threadsafe. Only streams served by this process see its posts.
+"""
+import asyncio
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import Transaction
+from .renderers import dumps
+from .serializers import TransactionRowSerializer
+from .signals import transactions_posted
+
+CENT = Decimal('0.01')
+
+# Queued in place of an event when a subscriber falls too far behind
+OVERFLOW = object()
+
+
+class Subscription:
+    """A stream's queue of encoded events, optionally limited to one account."""
+
+    def __init__(self, account_id, maxsize):
+        self.account_id = account_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Queue an event; runs on the subscriber's loop."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Make room for the marker; the stream ends and the client reconnects
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+
+class TransactionBroadcaster:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, account_id=None):
+        """Register a subscription; must be called on the event loop that will read it."""
+        subscription = Subscription(account_id, settings.LEDGER_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, transactions):
+        """Encode each transaction once and queue it for every matching subscription."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            return
+        rows = [
+            (tx.id, Decimal(tx.amount).quantize(CENT), tx.timestamp, tx.description, tx.account_id, tx.creator_id)
+            for tx in transactions
+        ]
+        for row, data in zip(rows, TransactionRowSerializer(rows).data):
+            event = b"id: %d\nevent: transaction\ndata: %s\n\n" % (row[0], dumps(data))
+            for subscription in subscriptions:
+                if subscription.account_id in (None, row[4]):
+                    try:
+                        subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                    except RuntimeError:
+                        self.unsubscribe(subscription)  # Its loop has closed
+
+
+broadcaster = TransactionBroadcaster()
+
+
+def broadcast_transactions(sender, transactions, **kwargs):
+    broadcaster.publish(transactions)
+
+
+def connect_signals():
+    transactions_posted.connect(broadcast_transactions, sender=Transaction, dispatch_uid='ledger_events_broadcast')
@@ -0,0 +1,162 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db import router
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .archive import archived_through, merge_export
+from .models import ArchivedTransaction, Transaction
+
+EXPORT_COLUMNS = ('id', 'account', 'creator', 'amount', 'timestamp', 'description')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows per chunk handed to the response, and per fetch from the database cursor
+CHUNK_ROWS = 500
+FETCH_SIZE = 2000
+
+
+def parse_bound(value, end=False):
+    """Parse an ISO date or datetime filter value into an aware datetime.
+
+    A bare date means the start of that day, or for an end bound the start
+    of the following day, so ranges include the whole end date.
+    """
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _export_query(model, account_id, start, end, using):
+    rows = model.objects.using(using)
+    if account_id is not None:
+        rows = rows.filter(account_id=account_id).order_by('timestamp', 'id')
+    else:
+        rows = rows.order_by('id')
+    if start is not None:
+        rows = rows.filter(timestamp__gte=start)
+    if end is not None:
+        rows = rows.filter(timestamp__lt=end)
+    return rows.values_list(
+        'id', 'account_id', 'creator_id', 'amount', 'timestamp', 'description'
+    ).iterator(chunk_size=FETCH_SIZE)
+
+
+def export_rows(account_id=None, start=None, end=None):
+    """Iterate over matching transactions as tuples in EXPORT_COLUMNS order.
+
+    Rows are read through a server-side iterator so memory use does not
+    grow with the ledger. A single account is exported in time order using
+    its (account, timestamp) index; otherwise rows come in primary key order.
+    Archived transactions are merged in only when the range starts before
+    the archive horizon. Nothing is queried until the first row is read,
+    but the database is picked now: streaming responses are read after
+    ReplicaRoutingMiddleware has finished with the request.
+    """
+    return _export_rows(account_id, start, end, router.db_for_read(Transaction))
+
+
+def _export_rows(account_id, start, end, using):
+    rows = _export_query(Transaction, account_id, start, end, using)
+    horizon = archived_through(account_id, using=using)
+    if horizon is not None and (start is None or start < horizon):
+        rows = merge_export(rows, _export_query(ArchivedTransaction, account_id, start, end, using), account_id)
+    yield from rows
+
+
+def aexport_rows(account_id=None, start=None, end=None):
+    """Async counterpart of export_rows, fetching FETCH_SIZE rows per trip to the database thread.
+
+    QuerySet.aiterator() cannot be used here: for a plain values_list() it
+    runs the query on the event loop and fails.
+    """
+    rows = export_rows(account_id, start, end)  # A generator; the queries run on the first fetch
+    fetch = sync_to_async(lambda: list(islice(rows, FETCH_SIZE)))
+
+    async def iterate():
+        while batch := await fetch():
+            for row in batch:
+                yield row
+    return iterate()
+
+
+def _chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer produced."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, header=True):
+    writer = csv.writer(_Echo())
+    if header:
+        yield writer.writerow(EXPORT_COLUMNS)
+    for tx_id, account_id, creator_id, amount, timestamp, description in rows:
+        yield writer.writerow((tx_id, account_id, creator_id, str(amount), timestamp.isoformat(), description))
+
+
+def _ndjson_lines(rows):
+    for tx_id, account_id, creator_id, amount, timestamp, description in rows:
+        yield json.dumps({
+            'id': tx_id,
+            'account': account_id,
+            'creator': creator_id,
+            'amount': str(amount),
+            'timestamp': timestamp.isoformat(),
+            'description': description,
+        }) + '\n'
+
+
+def _check_format(export_format):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {export_format}")
+
+
+def _lines(rows, export_format, header=True):
+    return _csv_lines(rows, header) if export_format == 'csv' else _ndjson_lines(rows)
+
+
+def render_export(rows, export_format):
+    """Yield the rows encoded as CSV (with a header row) or NDJSON, in chunks of text."""
+    _check_format(export_format)
+    return _chunked(_lines(rows, export_format))
+
+
+async def arender_export(rows, export_format):
+    """Async counterpart of render_export, for rows from an async iterator such as aexport_rows()."""
+    _check_format(export_format)
+    batch, header = [], True
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_ROWS:
+            yield ''.join(_lines(batch, export_format, header))
+            batch, header = [], False
+    tail = ''.join(_lines(batch, export_format, header))
+    if tail:
+        yield tail
@@ -0,0 +1,188 @@
+"""Idempotency keys for the endpoints that post transactions.
+
+A client that may retry a write sends a unique settings.LEDGER_IDEMPOTENCY_HEADER
+with it. The posting services claim the key of the request they run under
+inside their own database transaction (through the transactions_posting
+signal), so the key exists exactly when the post committed and the
+services' own lock retries keep working. Once the view returns, its
+response is stored on the claimed key. Retries with that key are answered
+from the stored response by one indexed lookup, without running the view
+again, for LEDGER_IDEMPOTENCY_TTL seconds; a retry that arrives before the
+response is stored gets a 409. Requests that posted nothing store nothing
+and can be retried with the same key. Reusing a key for a different
+request is refused. purge_idempotency_keys deletes expired keys.
+"""
+import contextvars
+import functools
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey, Transaction
+from .renderers import LedgerJsonResponse, dumps
+from .services import retry_on_locked
+from .signals import transactions_posting
+
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+PENDING = 0  # status_code of a key whose post committed but whose response is not stored yet
+
+
+class KeyInUse(Exception):
+    """Another request posted with the same idempotency key first."""
+
+
+@dataclass
+class _Claim:
+    scope: str
+    key: str
+    fingerprint: str
+    # Held in content_type until the response is stored, so only this request can store it
+    token: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+
+# The key of the request being handled, for the posting services to claim
+_pending = contextvars.ContextVar('ledger_idempotency_claim', default=None)
+
+
+def expiry_horizon():
+    """Return the moment before which stored keys have expired."""
+    return timezone.now() - timedelta(seconds=settings.LEDGER_IDEMPOTENCY_TTL)
+
+
+def request_fingerprint(request):
+    """Return a SHA-256 hex digest of the request's method, path, query string and body."""
+    digest = hashlib.sha256(f"{request.method} {request.get_full_path()}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _lookup(scope, key):
+    """Return the live stored response for a key, deleting it instead if it has expired."""
+    stored = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if stored is not None and stored.created_at < expiry_horizon():
+        stored.delete()
+        return None
+    return stored
+
+
+def _capture(response):
+    """Return the (status_code, content_type, body) to store for a response."""
+    if isinstance(response, Response):
+        # DRF renders after the view returns, so store the data and render it again on replay
+        return response.status_code, 'application/json', dumps(response.data)
+    return response.status_code, response.get('Content-Type', ''), response.content
+
+
+def _replay(stored, fingerprint, api):
+    if stored.fingerprint != fingerprint:
+        return LedgerJsonResponse({
+            "status": "error",
+            "message": f"{settings.LEDGER_IDEMPOTENCY_HEADER} {stored.key!r} was already used for a different request",
+        }, status=422)
+    if stored.status_code == PENDING:
+        return LedgerJsonResponse({
+            "status": "error",
+            "message": f"The request with {settings.LEDGER_IDEMPOTENCY_HEADER} {stored.key!r} is still being processed",
+        }, status=409)
+    body = bytes(stored.body)
+    if api:
+        response = Response(json.loads(body), status=stored.status_code)
+    else:
+        response = HttpResponse(body, status=stored.status_code, content_type=stored.content_type)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """Answer retries of a view sent with the same idempotency key from the stored response.
+
+    scope names the endpoint, so the same key may be used on different
+    endpoints. Works on function views and, through method_decorator, on
+    DRF viewset actions. Requests without the header are unaffected.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(settings.LEDGER_IDEMPOTENCY_HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return LedgerJsonResponse({
+                    "status": "error",
+                    "message": f"{settings.LEDGER_IDEMPOTENCY_HEADER} is longer than {MAX_KEY_LENGTH} characters",
+                }, status=400)
+
+            api = isinstance(request, Request)
+            fingerprint = request_fingerprint(request)
+            stored = _lookup(scope, key)
+            if stored is not None:
+                return _replay(stored, fingerprint, api)
+
+            claim = _Claim(scope, key, fingerprint)
+            token = _pending.set(claim)
+            try:
+                response = view(request, *args, **kwargs)
+            except KeyInUse:
+                response = None
+            finally:
+                _pending.reset(token)
+            if response is not None and _store(claim, response):
+                return response
+            stored = _lookup(scope, key)
+            if stored is not None:
+                # A concurrent request with the key posted first; our post was rolled back
+                return _replay(stored, fingerprint, api)
+            return response
+        return wrapper
+    return decorator
+
+
+def claim_key(sender, **kwargs):
+    """Claim the key of the request being handled, inside the posting's database transaction.
+
+    Raises KeyInUse, rolling the post back, if another request holds the key.
+    """
+    claim = _pending.get()
+    if claim is None:
+        return
+    try:
+        IdempotencyKey.objects.create(
+            scope=claim.scope, key=claim.key, fingerprint=claim.fingerprint,
+            status_code=PENDING, content_type=claim.token, body=b'',
+        )
+    except IntegrityError:
+        raise KeyInUse(claim.key) from None
+
+
+@retry_on_locked
+def _store(claim, response):
+    """Store the response on the key its post claimed; False if nothing was posted under the key."""
+    status_code, content_type, body = _capture(response)
+    return bool(IdempotencyKey.objects.filter(
+        scope=claim.scope, key=claim.key, status_code=PENDING, content_type=claim.token,
+    ).update(status_code=status_code, content_type=content_type, body=body))
+
+
+def purge_expired(batch_size=1000):
+    """Delete keys older than LEDGER_IDEMPOTENCY_TTL in batches and return how many were deleted."""
+    horizon = expiry_horizon()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(created_at__lt=horizon).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+def connect_signals():
+    transactions_posting.connect(claim_key, sender=Transaction, dispatch_uid='ledger_idempotency_claim')
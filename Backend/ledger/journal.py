@@ -0,0 +1,178 @@
+"""Append-only, hash-chained journal of balance changes.
+
+Every change to an account's balance (posts, deletes, adjustments and
+overrides) appends a JournalEntry in the same database transaction. Each
+entry's hash covers its fields and the previous entry's hash, so altering,
+removing or reordering an entry breaks the chain from that point on, and the
+last entry's balance must match the account's. verify_journal re-hashes each
+chain from the account's last JournalCheckpoint rather than from the start.
+Copy the checkpoint hashes it reports somewhere the application cannot
+write, and a rewritten journal can be told apart from the verified one.
+"""
+import hashlib
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Account, JournalCheckpoint, JournalEntry
+
+GENESIS_HASH = '0' * 64
+CENT = Decimal('0.01')
+
+# Fields of an entry that verification reads, in order
+ENTRY_FIELDS = (
+    'sequence', 'kind', 'transaction_id', 'amount', 'balance', 'description', 'created_at', 'previous_hash', 'hash',
+)
+VERIFY_FETCH_SIZE = 5000
+
+
+def _money(value):
+    # Adding 0 turns -0.00 into 0.00, as the database stores it
+    return f"{Decimal(value).quantize(CENT) + 0:f}"
+
+
+def entry_hash(previous_hash, account_id, sequence, kind, transaction_id, amount, balance, description, created_at):
+    """Return the SHA-256 hex digest chaining an entry to previous_hash."""
+    fields = (
+        previous_hash, str(account_id), str(sequence), kind, '' if transaction_id is None else str(transaction_id),
+        _money(amount), _money(balance), created_at.astimezone(dt_timezone.utc).isoformat(), description,
+    )
+    return hashlib.sha256('\x1f'.join(fields).encode()).hexdigest()
+
+
+def _last_entry(account_id):
+    """Return the (sequence, hash, balance) of the account's newest entry, or the chain's starting point."""
+    last = (
+        JournalEntry.objects.filter(account_id=account_id).order_by('-sequence')
+        .values_list('sequence', 'hash', 'balance').first()
+    )
+    return last or (0, GENESIS_HASH, Decimal('0.00'))
+
+
+def _entries(account_id, last, created_at, entries):
+    sequence, previous, _ = last
+    rows = []
+    for kind, amount, balance, transaction_id, description in entries:
+        sequence += 1
+        entry = JournalEntry(
+            account_id=account_id, sequence=sequence, kind=kind, transaction_id=transaction_id,
+            amount=amount, balance=balance, description=description, created_at=created_at, previous_hash=previous,
+        )
+        entry.hash = previous = entry_hash(
+            previous, account_id, sequence, kind, transaction_id, amount, balance, description, created_at
+        )
+        rows.append(entry)
+    return rows
+
+
+def _append(account_id, last, entries):
+    return JournalEntry.objects.bulk_create(_entries(account_id, last, timezone.now(), entries))
+
+
+def record(account_id, entries):
+    """Append entries, each (kind, amount, balance, transaction_id, description), to an account's journal.
+
+    Call inside the database transaction that changed the balance, after
+    the UPDATE that locked the account, so appends to one account are
+    serialized and commit or roll back with the change they describe.
+    """
+    return _append(account_id, _last_entry(account_id), entries)
+
+
+def open_journals(balances, batch_size=None):
+    """Start the journals of accounts that have none at their {account_id: balance}, skipping zero balances.
+
+    For ledgers written without going through the services, such as
+    seed_ledger's bulk inserts.
+    """
+    created_at = timezone.now()
+    entries = []
+    for account_id, balance in balances.items():
+        if balance:
+            entries.extend(_entries(account_id, (0, GENESIS_HASH, Decimal('0.00')), created_at, [
+                (JournalEntry.OPEN, balance, balance, None, 'Opening balance'),
+            ]))
+    return JournalEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def record_override(account_id, balance, kind=JournalEntry.OVERRIDE, description=''):
+    """Journal a balance that was set rather than moved, as a change from the journal's last balance.
+
+    Does nothing if the balance already matches the journal. Same calling
+    rules as record().
+    """
+    last = _last_entry(account_id)
+    amount = Decimal(balance) - last[2]
+    if not amount:
+        return []
+    return _append(account_id, last, [(kind, amount, balance, None, description)])
+
+
+def verify_account(account_id, checkpoint=None):
+    """Check an account's chain after checkpoint and return (entries_checked, end, problem).
+
+    end is the (sequence, hash, balance) the chain was verified through and
+    problem a message, or None if the chain and balance are intact. Takes no
+    locks: if posts land while the chain is read, their entries are checked
+    too before the journal's balance is compared with the account's.
+    """
+    sequence, previous, journal_balance = checkpoint or (0, GENESIS_HASH, Decimal('0.00'))
+    entries = JournalEntry.objects.filter(account_id=account_id)
+    if sequence and not entries.filter(sequence=sequence, hash=previous).exists():
+        return 0, None, f"entry #{sequence} no longer matches its checkpoint"
+
+    checked = 0
+    while True:
+        rows = entries.filter(sequence__gt=sequence).order_by('sequence').values_list(*ENTRY_FIELDS)
+        for (entry_sequence, kind, transaction_id, amount, entry_balance, description, created_at,
+             previous_hash, stored_hash) in rows.iterator(chunk_size=VERIFY_FETCH_SIZE):
+            checked += 1
+            if entry_sequence != sequence + 1:
+                return checked, None, f"entries #{sequence + 1}-#{entry_sequence - 1} are missing"
+            if previous_hash != previous:
+                return checked, None, f"entry #{entry_sequence} does not follow #{sequence}"
+            if entry_hash(previous, account_id, entry_sequence, kind, transaction_id, amount, entry_balance,
+                          description, created_at) != stored_hash:
+                return checked, None, f"entry #{entry_sequence} was altered"
+            sequence, previous, journal_balance = entry_sequence, stored_hash, entry_balance
+        # The balance and the newest entry from one statement, so they agree
+        balance, latest = (
+            Account.objects.filter(pk=account_id).values_list('balance')
+            .annotate(latest=Max('journal__sequence')).get()
+        )
+        if (latest or 0) <= sequence:
+            break
+    if balance != journal_balance:
+        return checked, None, f"balance {balance} differs from the journal's {journal_balance}"
+    return checked, (sequence, previous, journal_balance), None
+
+
+def verify_journal(account_ids=None, full=False):
+    """Verify every account's journal and return (entries_checked, problems).
+
+    Each chain is checked from the account's latest checkpoint, or from the
+    start with full=True, and a new checkpoint is recorded for each account
+    whose chain verified and grew. problems is a list of
+    (account_id, message).
+    """
+    accounts = Account.objects.order_by('id')
+    if account_ids:
+        accounts = accounts.filter(id__in=account_ids)
+    checkpoints = {}
+    latest = JournalCheckpoint.objects.filter(account__in=accounts).order_by('account_id', 'sequence')
+    for account_id, *checkpoint in latest.values_list('account_id', 'sequence', 'hash', 'balance'):
+        checkpoints[account_id] = tuple(checkpoint)
+
+    total, problems = 0, []
+    for account_id in accounts.values_list('id', flat=True):
+        checkpoint = checkpoints.get(account_id)
+        checked, end, problem = verify_account(account_id, None if full else checkpoint)
+        total += checked
+        if problem is not None:
+            problems.append((account_id, problem))
+        elif end[0] > (checkpoint[0] if checkpoint else 0):
+            sequence, hash_, balance = end
+            JournalCheckpoint.objects.create(account_id=account_id, sequence=sequence, hash=hash_, balance=balance)
+    return total, problems
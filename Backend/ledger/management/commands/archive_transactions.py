@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ledger.archive import archive_transactions, default_horizon
+from ledger.exports import parse_bound
+from ledger.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Moves transactions older than the archive horizon (LEDGER_ARCHIVE_AFTER_DAYS) into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive transactions older than this many days')
+        parser.add_argument('--before', help='Archive transactions before this ISO date or datetime')
+        parser.add_argument('--batch-size', type=int, help='Rows moved per database transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['before']:
+            raise CommandError('Pass either --days or --before, not both.')
+        try:
+            before = parse_bound(options['before'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+        before = before or default_horizon()
+
+        if options['dry_run']:
+            count = Transaction.objects.filter(timestamp__lt=before).count()
+            self.stdout.write(self.style.SUCCESS(f'{count} transaction(s) before {before.isoformat()} would be archived'))
+            return
+        moved = archive_transactions(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} transaction(s) before {before.isoformat()}'))
@@ -0,0 +1,103 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from ledger.benchmarking import benchmark_requests, scratch_database, seed_ledger
+from ledger.models import Account
+
+
+class Command(BaseCommand):
+    help = 'Seeds a scratch database and benchmarks the ledger API and HTML endpoints through the test client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--accounts-per-user', type=int, default=2)
+        parser.add_argument('--transactions-per-account', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run this endpoint (repeatable)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare against results previously written with --output')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        with scratch_database():
+            self.stdout.write('Seeding the scratch database...')
+            accounts = seed_ledger(
+                users=options['users'],
+                accounts_per_user=options['accounts_per_user'],
+                transactions_per_account=options['transactions_per_account'],
+                seed=options['seed'],
+            )
+            endpoints = self.endpoints(Client(HTTP_HOST='localhost'), accounts)
+            selected = options['endpoints'] or list(endpoints)
+            unknown = set(selected) - set(endpoints)
+            if unknown:
+                raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+            results = {}
+            for name in selected:
+                results[name] = benchmark_requests(endpoints[name], options['requests'])
+                self.report(name, results[name], baseline)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'dataset': {
+                        key: options[key]
+                        for key in ('users', 'accounts_per_user', 'transactions_per_account', 'seed')
+                    },
+                    'endpoints': results,
+                }, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def endpoints(self, client, accounts):
+        """Map endpoint names to callables that send request number i."""
+        account = accounts[len(accounts) // 2]
+        owner_id = Account.objects.values_list('owner_id', flat=True).get(pk=account.pk)
+        history = reverse('get_transaction_history', args=[account.pk])
+
+        def post_viewset(i):
+            return client.post('/api/transactions/', {
+                'account': account.pk, 'creator': owner_id, 'amount': '1.00',
+                'description': f'Benchmark {i}', 'timestamp': '2025-01-01T12:00:00Z',
+            })
+
+        return {
+            'users_list': lambda i: client.get('/api/users/'),
+            'accounts_list': lambda i: client.get('/api/accounts/'),
+            'accounts_detail': lambda i: client.get(f'/api/accounts/{account.pk}/'),
+            'transactions_list': lambda i: client.get('/api/transactions/'),
+            'transactions_create': post_viewset,
+            'create_transaction': lambda i: client.get(
+                reverse('create_transaction', args=[account.pk, '1.00', f'Benchmark {i}'])
+            ),
+            'transaction_history': lambda i: client.get(history),
+            'index': lambda i: client.get(reverse('index')),
+            'accounts_page': lambda i: client.get(reverse('accounts')),
+        }
+
+    def report(self, name, result, baseline):
+        line = (
+            f"{name:<22} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+            f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+            f"{result['queries_per_request']:>5.1f} queries"
+        )
+        previous = (baseline or {}).get('endpoints', {}).get(name)
+        if previous and previous['p50_ms']:
+            change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100
+            line += f"  p50 {change:+.1f}% vs baseline"
+        self.stdout.write(line)
@@ -0,0 +1,65 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from ledger.benchmarking import load_test_asgi, load_test_wsgi, scratch_database, seed_ledger
+
+
+class Command(BaseCommand):
+    help = 'Seeds a scratch database and load-tests the sync (WSGI) and async (ASGI) read endpoints ' \
+           'with many simultaneous, optionally slow, clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions-per-account', type=int, default=500)
+        parser.add_argument('--clients', type=int, default=200, help='Simultaneous requests per endpoint')
+        parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--read-delay', type=float, default=0.2,
+                            help='Seconds a slow client takes to read each response chunk')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run this endpoint (repeatable)')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        # The load tests use the test clients, which send Host: testserver
+        with scratch_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.stdout.write('Seeding the scratch database...')
+            accounts = seed_ledger(users=options['users'],
+                                   transactions_per_account=options['transactions_per_account'])
+            account = accounts[len(accounts) // 2]
+            endpoints = {
+                'history': (reverse('get_transaction_history', args=[account.pk]),
+                            reverse('async_transaction_history', args=[account.pk])),
+                'accounts': ('/api/accounts/', reverse('async_accounts')),
+                'export': (f"{reverse('export_transactions')}?account={account.pk}",
+                           f"{reverse('async_export_transactions')}?account={account.pk}"),
+            }
+            selected = options['endpoints'] or list(endpoints)
+            unknown = set(selected) - set(endpoints)
+            if unknown:
+                raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+            results = {}
+            for name in selected:
+                sync_path, async_path = endpoints[name]
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{name}: {options['clients']} clients, {options['read_delay'] * 1000:.0f} ms per chunk read"
+                ))
+                results[name] = {
+                    'wsgi': load_test_wsgi(sync_path, options['clients'], options['workers'], options['read_delay']),
+                    'asgi': load_test_asgi(async_path, options['clients'], options['read_delay']),
+                }
+                for server, result in results[name].items():
+                    label = f"{server} ({options['workers']} threads)" if server == 'wsgi' else server
+                    self.stdout.write(
+                        f"{label:<18} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.1f} ms  "
+                        f"p99 {result['p99_ms']:>8.1f} ms  peak threads {result['peak_threads']}"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
@@ -0,0 +1,76 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ledger.benchmarking import scratch_database, seed_ledger, time_call
+from ledger.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Seeds a scratch database and reports query plans and latency for the hot ledger queries, ' \
+           'with and without the Transaction indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--accounts-per-user', type=int, default=2)
+        parser.add_argument('--transactions-per-account', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per query')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write('Seeding the scratch database...')
+            accounts = seed_ledger(
+                users=options['users'],
+                accounts_per_user=options['accounts_per_user'],
+                transactions_per_account=options['transactions_per_account'],
+            )
+            results = {
+                'without_indexes': self.run_queries(accounts, options['repeat'], drop_indexes=True),
+                'with_indexes': self.run_queries(accounts, options['repeat']),
+            }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def run_queries(self, accounts, repeat, drop_indexes=False):
+        """Time each hot query shape, optionally after dropping the Meta indexes."""
+        indexes = Transaction._meta.indexes
+        if drop_indexes:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Transaction, index)
+
+        account = accounts[len(accounts) // 2]
+        newest = Transaction.objects.filter(creator_id=account.owner_id).order_by('-timestamp').first()
+        end = newest.timestamp if newest else None
+        queries = {
+            'account_history': Transaction.objects.filter(account=account).order_by('-timestamp', '-id')[:100],
+            'creator_range': Transaction.objects.filter(
+                creator_id=account.owner_id, timestamp__lte=end, timestamp__gte=end - timedelta(days=30),
+            ).order_by('timestamp') if end else Transaction.objects.none(),
+        }
+
+        label = 'without indexes' if drop_indexes else 'with indexes'
+        results = {}
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            timing = time_call(lambda: list(queryset.all()), repeat)
+            results[name] = {'plan': plan, **timing}
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({label})"))
+            self.stdout.write(plan)
+            self.stdout.write(
+                f"p50 {timing['p50_ms']:.2f} ms, p95 {timing['p95_ms']:.2f} ms, p99 {timing['p99_ms']:.2f} ms"
+            )
+
+        if drop_indexes:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Transaction, index)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        return results
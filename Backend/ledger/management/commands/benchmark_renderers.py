@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from ledger.benchmarking import scratch_database, seed_ledger, time_call
+from ledger.models import Transaction
+from ledger.renderers import LedgerJSONRenderer, dumps, orjson
+from ledger.serializers import TransactionRowSerializer
+from ledger.views import HISTORY_FIELDS, history_payload
+
+
+class Command(BaseCommand):
+    help = 'Seeds a scratch database and compares JSON encode time and size for transaction payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append', dest='sizes',
+                            help='Transactions per payload (repeatable, default 100, 1000 and 10000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed encodes per payload')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'] or [100, 1000, 10000]
+        backends = ['json'] + (['orjson'] if orjson is not None else [])
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; only the standard library is compared'))
+
+        with scratch_database():
+            self.stdout.write('Seeding the scratch database...')
+            account = seed_ledger(users=1, accounts_per_user=1, transactions_per_account=max(sizes))[0]
+            transactions = Transaction.objects.filter(account=account).order_by('-timestamp', '-id')
+
+            results = {}
+            for size in sizes:
+                history = history_payload(list(transactions.values_list(*HISTORY_FIELDS, named=True)[:size]), None)
+                rows = TransactionRowSerializer(transactions.values_list(*TransactionRowSerializer.fields)[:size]).data
+                baseline = {
+                    'history JsonResponse': lambda: json.dumps(history, cls=DjangoJSONEncoder).encode(),
+                    'api JSONRenderer': lambda: JSONRenderer().render(rows),
+                }
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{size} transactions'))
+                results[size] = self.run_encoders(baseline, options['repeat'])
+                for backend in backends:
+                    with override_settings(LEDGER_JSON_BACKEND=backend):
+                        results[size].update(self.run_encoders({
+                            f'history {backend}': lambda: dumps(history),
+                            f'api {backend}': lambda: LedgerJSONRenderer().render(rows),
+                        }, options['repeat']))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def run_encoders(self, encoders, repeat):
+        results = {}
+        for name, encode in encoders.items():
+            result = results[name] = {**time_call(encode, repeat), 'bytes': len(encode())}
+            self.stdout.write(
+                f"{name:<22} p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+                f"{result['bytes']:>10} bytes"
+            )
+        return results
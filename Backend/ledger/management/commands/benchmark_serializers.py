@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.benchmarking import scratch_database, seed_ledger, time_call
+from ledger.models import Transaction
+from ledger.serializers import TransactionRowSerializer, TransactionSerializer
+
+
+class Command(BaseCommand):
+    help = 'Seeds a scratch database and compares TransactionSerializer with the values_list fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append', dest='sizes',
+                            help='Rows serialized per run (repeatable, default 1000 and 20000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per size')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'] or [1000, 20000]
+        with scratch_database():
+            self.stdout.write('Seeding the scratch database...')
+            seed_ledger(users=10, accounts_per_user=2, transactions_per_account=-(-max(sizes) // 20))
+
+            results = {}
+            for size in sizes:
+                queryset = Transaction.objects.order_by('-id')[:size]
+                model_data = lambda: TransactionSerializer(list(queryset.all()), many=True).data
+                fast_data = lambda: TransactionRowSerializer(
+                    list(queryset.values_list(*TransactionRowSerializer.fields))
+                ).data
+                if json.dumps(model_data()) != json.dumps(fast_data()):
+                    raise CommandError(f'Fast path output differs from TransactionSerializer at {size} rows')
+
+                results[size] = {
+                    'model_serializer': time_call(model_data, options['repeat']),
+                    'row_serializer': time_call(fast_data, options['repeat']),
+                }
+                self.report(size, results[size])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def report(self, size, result):
+        model, fast = result['model_serializer']['p50_ms'], result['row_serializer']['p50_ms']
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{size} rows (query + serialize)'))
+        for name, p50 in (('TransactionSerializer', model), ('TransactionRowSerializer', fast)):
+            self.stdout.write(f'{name:<26} p50 {p50:>9.2f} ms  {size / p50 * 1000:>10.0f} rows/s')
+        self.stdout.write(f'speedup {model / fast:.1f}x')
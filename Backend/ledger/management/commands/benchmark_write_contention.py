@@ -0,0 +1,64 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from ledger.benchmarking import database_profile, scratch_database, seed_ledger, write_contention
+
+
+class Command(BaseCommand):
+    help = 'Seeds a scratch database per SQLite profile and measures create_transaction throughput ' \
+           'with many concurrent writers and readers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles',
+                            help='Database profile from LEDGER_DATABASE_PROFILES (repeatable, default all)')
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions-per-account', type=int, default=200)
+        parser.add_argument('--writers', type=int, default=8, help='Threads posting transactions at once')
+        parser.add_argument('--posts', type=int, default=100, help='Posts per writer')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Threads reading transaction history while the writers run')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or list(settings.LEDGER_DATABASE_PROFILES)
+        unknown = set(profiles) - set(settings.LEDGER_DATABASE_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in profiles:
+            # Each profile gets its own scratch database, since WAL mode persists in the file
+            with database_profile(settings.LEDGER_DATABASE_PROFILES[name]), scratch_database(), \
+                    override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                accounts = seed_ledger(users=options['users'],
+                                       transactions_per_account=options['transactions_per_account'])
+
+                def post(i):
+                    account = accounts[i % len(accounts)]
+                    response = Client(raise_request_exception=False).get(
+                        reverse('create_transaction', args=[account.pk, '1.00', f'Contention {i}'])
+                    )
+                    # create_transaction reports failures such as "database is locked" in the body
+                    return response.status_code == 200 and response.json()['status'] == 'success'
+
+                def read(i):
+                    account = accounts[i % len(accounts)]
+                    return Client().get(reverse('get_transaction_history', args=[account.pk]))
+
+                results[name] = result = write_contention(
+                    post, read, options['writers'], options['posts'], options['readers']
+                )
+            self.stdout.write(
+                f"{name:<12} {result['writes_per_second']:>8.1f} writes/s  p50 {result['p50_ms']:>8.1f} ms  "
+                f"p99 {result['p99_ms']:>8.1f} ms  {result['errors']:>4} failed  "
+                f"{result['reads_per_second']:>8.1f} reads/s"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.exports import EXPORT_FORMATS, export_rows, parse_bound, render_export
+
+
+class Command(BaseCommand):
+    help = 'Exports transactions as CSV or NDJSON without loading the ledger into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--account', type=int, help='Only export this account')
+        parser.add_argument('--start', help='Earliest date or datetime to include (ISO 8601)')
+        parser.add_argument('--end', help='End of the range (ISO 8601, exclusive); a bare date includes that whole day')
+        parser.add_argument('--output', help='File to write to; defaults to stdout')
+
+    def handle(self, *args, **options):
+        try:
+            rows = export_rows(
+                account_id=options['account'],
+                start=parse_bound(options['start']),
+                end=parse_bound(options['end'], end=True),
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                for chunk in render_export(rows, options['format']):
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Exported transactions to {options['output']}"))
+        else:
+            for chunk in render_export(rows, options['format']):
+                self.stdout.write(chunk, ending='')
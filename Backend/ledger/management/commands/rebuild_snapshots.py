@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ledger.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily and monthly balance snapshots from the transaction log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help='Only rebuild this account (repeatable)')
+
+    def handle(self, *args, **options):
+        count = rebuild_snapshots(options['accounts'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} snapshots'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ledger.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Compares account balances with the sum of their transactions and optionally repairs drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only check accounts touched since the last checkpoint')
+        parser.add_argument('--repair', action='store_true', help='Reset drifted balances to the transaction sum')
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help='Only check this account (repeatable)')
+
+    def handle(self, *args, **options):
+        checked, drift = reconcile(
+            incremental=options['incremental'], repair=options['repair'], account_ids=options['accounts']
+        )
+        for account_id, stored, expected in drift:
+            self.stdout.write(self.style.WARNING(
+                f'Account {account_id}: stored {stored}, transactions sum to {expected} '
+                f'(drift {stored - expected})'
+            ))
+        action = 'repaired' if options['repair'] else 'found'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} accounts, {action} {len(drift)} with drift'
+        ))
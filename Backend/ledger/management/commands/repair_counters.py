@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ledger.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts the per-account and global transaction counters and fixes any that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        drift = repair_counters(dry_run=options['dry_run'])
+        for name, stored, actual in drift:
+            self.stdout.write(self.style.WARNING(f'{name}: stored {stored}, actual {actual}'))
+        action = 'found' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'{action.capitalize()} {len(drift)} drifted counter(s)'))
@@ -1,11 +1,27 @@
 from django.core.management.base import BaseCommand
+from ledger.benchmarking import seed_ledger
 from ledger.models import User, Account
-from datetime import datetime
+import time
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data'
+    help = 'Seeds the database with initial data, or with a large synthetic ledger when --users is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0,
+                            help='Generate this many users instead of the single test user')
+        parser.add_argument('--accounts-per-user', type=int, default=2)
+        parser.add_argument('--authorized-users', type=int, default=2,
+                            help='Random authorized users added to each account')
+        parser.add_argument('--transactions-per-account', type=int, default=500)
+        parser.add_argument('--days', type=int, default=365, help='Spread transactions over this many past days')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per INSERT batch')
 
     def handle(self, *args, **options):
+        if options['users']:
+            self.generate(options)
+            return
+
         # Create a test user
         user, created = User.objects.get_or_create(
             name="Test User",
@@ -31,4 +47,22 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(self.style.SUCCESS(f'Created account: {account_name}'))
         
-        self.stdout.write(self.style.SUCCESS('Successfully seeded the database')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Successfully seeded the database')) 
+
+    def generate(self, options):
+        """Generate a synthetic ledger for load testing."""
+        started = time.perf_counter()
+        accounts = seed_ledger(
+            users=options['users'],
+            accounts_per_user=options['accounts_per_user'],
+            authorized_users=options['authorized_users'],
+            transactions_per_account=options['transactions_per_account'],
+            days=options['days'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        total = len(accounts) * options['transactions_per_account']
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['users']} users, {len(accounts)} accounts and {total} transactions "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ledger.routers import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary database over the read replica (LEDGER_REPLICA_DATABASE), ' \
+           'once or every --interval seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep copying, waiting this many seconds between copies')
+
+    def handle(self, *args, **options):
+        if not settings.LEDGER_READ_REPLICA:
+            raise CommandError('No read replica is configured; set LEDGER_REPLICA_DATABASE.')
+        path = connections[settings.LEDGER_READ_REPLICA].settings_dict['NAME']
+        while True:
+            started = time.perf_counter()
+            copy_database(path)
+            self.stdout.write(f'Copied the primary to {settings.LEDGER_READ_REPLICA} '
+                              f'in {(time.perf_counter() - started) * 1000:.1f} ms')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.journal import verify_journal
+from ledger.models import JournalCheckpoint
+
+
+class Command(BaseCommand):
+    help = "Verifies each account's hash-chained journal from its last checkpoint and records new checkpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Verify every chain from its first entry')
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help='Only verify this account (repeatable)')
+        parser.add_argument('--show-checkpoints', action='store_true',
+                            help="Print each account's latest checkpoint hash, to keep outside the database")
+
+    def handle(self, *args, **options):
+        checked, problems = verify_journal(account_ids=options['accounts'], full=options['full'])
+        for account_id, problem in problems:
+            self.stdout.write(self.style.ERROR(f'Account {account_id}: {problem}'))
+        if options['show_checkpoints']:
+            checkpoints = JournalCheckpoint.objects.order_by('account_id', '-sequence')
+            if options['accounts']:
+                checkpoints = checkpoints.filter(account_id__in=options['accounts'])
+            latest = {}
+            for account_id, sequence, hash_ in checkpoints.values_list('account_id', 'sequence', 'hash'):
+                latest.setdefault(account_id, (sequence, hash_))
+            for account_id, (sequence, hash_) in latest.items():
+                self.stdout.write(f'{account_id} #{sequence} {hash_}')
+        if problems:
+            raise CommandError(f'Checked {checked} journal entries, {len(problems)} accounts failed verification')
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} journal entries, all chains intact'))
@@ -0,0 +1,161 @@
+import math
+import threading
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest-rank), or 0.0 if empty."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class LatencyWindow:
+    """Thread-safe rolling window of the most recent durations, in seconds."""
+
+    def __init__(self, size=1000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self):
+        """Return lifetime count/total and percentiles over the current window."""
+        with self._lock:
+            samples = list(self._samples)
+            count, total = self.count, self.total
+        return {
+            "count": count,
+            "total_seconds": total,
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+            "max": max(samples, default=0.0),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.count = 0
+            self.total = 0.0
+
+
+@dataclass
+class RequestStats:
+    """Timings collected while one request is handled."""
+    queries: int = 0
+    db_seconds: float = 0.0
+    serializer_seconds: float = 0.0
+
+
+# Stats of the request being handled, set by RequestMetricsMiddleware
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+def record_serializer_time(seconds):
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.serializer_seconds += seconds
+
+
+class ViewMetrics:
+    """Per-view totals and a rolling latency window, rendered for Prometheus."""
+
+    def __init__(self, window=1000):
+        self._window = window
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, seconds, stats):
+        with self._lock:
+            entry = self._views.get(view)
+            if entry is None:
+                entry = self._views[view] = {
+                    "latency": LatencyWindow(self._window),
+                    "queries": 0,
+                    "db_seconds": 0.0,
+                    "serializer_seconds": 0.0,
+                }
+            entry["queries"] += stats.queries
+            entry["db_seconds"] += stats.db_seconds
+            entry["serializer_seconds"] += stats.serializer_seconds
+        entry["latency"].observe(seconds)
+
+    def snapshot(self):
+        """Return {view: totals and latency percentiles}."""
+        with self._lock:
+            views = {view: dict(entry) for view, entry in self._views.items()}
+        return {
+            view: {
+                **entry["latency"].snapshot(),
+                "queries": entry["queries"],
+                "db_seconds": entry["db_seconds"],
+                "serializer_seconds": entry["serializer_seconds"],
+            }
+            for view, entry in views.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+view_metrics = ViewMetrics()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _summary(lines, name, help_text, series):
+    """Append a Prometheus summary built from {label_string: LatencyWindow snapshot}."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    for labels, snap in series.items():
+        for quantile in ("50", "95", "99"):
+            quantile_labels = ",".join(filter(None, [labels, f'quantile="0.{quantile}"']))
+            lines.append(f"{name}{{{quantile_labels}}} {snap['p' + quantile]}")
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {snap['total_seconds']}")
+        lines.append(f"{name}_count{suffix} {snap['count']}")
+
+
+def render_prometheus(posting=None, cache=None):
+    """Render view metrics in Prometheus text format.
+
+    posting is an optional posting latency snapshot and cache an optional
+    {name: {"hit": n, "miss": n}} of cache lookups.
+    """
+    views = view_metrics.snapshot()
+    lines = []
+    _summary(lines, "ledger_view_duration_seconds", "Wall time spent in each view.",
+             {f'view="{_label(view)}"': snap for view, snap in views.items()})
+    for key, name, help_text in (
+        ("queries", "ledger_view_db_queries_total", "Database queries run by each view."),
+        ("db_seconds", "ledger_view_db_seconds_total", "Time spent executing database queries in each view."),
+        ("serializer_seconds", "ledger_view_serializer_seconds_total",
+         "Time spent producing DRF serializer output in each view."),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for view, snap in views.items():
+            lines.append(f'{name}{{view="{_label(view)}"}} {snap[key]}')
+    if posting is not None:
+        _summary(lines, "ledger_posting_duration_seconds", "Wall time of each transaction post.", {"": posting})
+    if cache is not None:
+        lines.append("# HELP ledger_cache_requests_total Cached ledger reads by result.")
+        lines.append("# TYPE ledger_cache_requests_total counter")
+        for name, counts in cache.items():
+            for result, count in counts.items():
+                lines.append(f'ledger_cache_requests_total{{cache="{_label(name)}",result="{result}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,187 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from .metrics import RequestStats, current_request_stats, view_metrics
+from .profiling import profile_store, run_profiled
+from .routers import RoutingState, current_routing
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, query count, database time and serializer time per view.
+
+    Queries are timed with a database execute wrapper on every connection.
+    Work done while a StreamingHttpResponse is being consumed happens after
+    the view returns and is not counted. Under ASGI the wrappers are
+    installed on the connections of the thread the async ORM runs queries on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with self.wrap_connections(stats):
+                response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        self.record(request, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        # Installed and removed on the thread that runs the request's database queries
+        wrappers = await sync_to_async(self.wrap_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+            current_request_stats.reset(token)
+        self.record(request, started, stats)
+        return response
+
+    def wrap_connections(self, stats):
+        """Add the query timer to this thread's connections; close the returned stack to remove it."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self.time_query(stats)))
+        return stack
+
+    @staticmethod
+    def record(request, started, stats):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            view_metrics.record(match.view_name or match._func_path, time.perf_counter() - started, stats)
+
+    @staticmethod
+    def time_query(stats):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats.queries += 1
+                stats.db_seconds += time.perf_counter() - started
+        return wrapper
+
+
+class ProfilingMiddleware:
+    """Profile selected requests to ledger views with cProfile.
+
+    Only runs when LEDGER_PROFILING_ENABLED is set. A request is profiled if
+    it sends the LEDGER_PROFILING_HEADER header with value 1, or if it is
+    picked by LEDGER_PROFILING_SAMPLE_RATE. At most
+    LEDGER_PROFILING_MAX_PER_MINUTE are taken, and only one at a time.
+    Requests served over ASGI are not profiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            # cProfile only sees its own thread, and under ASGI views run elsewhere
+            return self.get_response(request)
+        if not settings.LEDGER_PROFILING_ENABLED:
+            return self.get_response(request)
+        view = self.ledger_view(request)
+        if view is None or not profile_store.allow(request):
+            return self.get_response(request)
+        if not profile_store.profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            started = time.perf_counter()
+            response, profiler, queries = run_profiled(self.get_response, request)
+            profile_store.add(request, view, response, time.perf_counter() - started, profiler, queries)
+        finally:
+            profile_store.profiler_lock.release()
+        return response
+
+    @staticmethod
+    def ledger_view(request):
+        """Return the view name if the request resolves to ledger.views, else None."""
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        # DRF viewsets expose their class as .cls on the view function
+        if getattr(match.func, 'cls', match.func).__module__ != 'ledger.views':
+            return None
+        return match.view_name
+
+
+class ReplicaRoutingMiddleware:
+    """Track whether a request wrote, for ReplicaRouter's read-your-writes stickiness.
+
+    Only does anything when LEDGER_READ_REPLICA is set. Requests with an
+    unsafe method, or from a client that wrote within the last
+    LEDGER_REPLICA_STICKY_SECONDS, read from the primary; a response to a
+    request that wrote (re)sets the LEDGER_REPLICA_STICKY_COOKIE cookie.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.LEDGER_READ_REPLICA:
+            return self.get_response(request)
+        state = self.state(request)
+        token = current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.mark(response, state)
+
+    async def __acall__(self, request):
+        if not settings.LEDGER_READ_REPLICA:
+            return await self.get_response(request)
+        state = self.state(request)
+        token = current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.mark(response, state)
+
+    @staticmethod
+    def state(request):
+        sticky = settings.LEDGER_REPLICA_STICKY_COOKIE in request.COOKIES
+        return RoutingState(pinned=sticky or request.method not in ('GET', 'HEAD', 'OPTIONS'))
+
+    @staticmethod
+    def mark(response, state):
+        if state.wrote:
+            response.set_cookie(
+                settings.LEDGER_REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.LEDGER_REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
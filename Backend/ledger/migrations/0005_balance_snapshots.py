@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0004_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('D', 'Day'), ('M', 'Month')], max_length=1)),
+                ('period_start', models.DateField()),
+                ('credits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('debits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='ledger.account')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'period', 'period_start'), name='ledger_snapshot_unique_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_transactions(apps, schema_editor):
+    Account = apps.get_model('ledger', 'Account')
+    Transaction = apps.get_model('ledger', 'Transaction')
+    LedgerCounter = apps.get_model('ledger', 'LedgerCounter')
+    counts = (
+        Transaction.objects.filter(account=OuterRef('pk'))
+        .order_by()
+        .values('account')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Account.objects.update(transaction_count=Coalesce(Subquery(counts), Value(0)))
+    LedgerCounter.objects.create(name='transactions', value=Transaction.objects.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0006_reconciliation_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='transaction_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(count_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0007_transaction_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
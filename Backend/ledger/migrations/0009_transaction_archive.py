@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0008_account_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.BigIntegerField(default=0)),
+                ('archived_through', models.DateTimeField()),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='opening_balance', to='ledger.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('timestamp', models.DateTimeField()),
+                ('description', models.TextField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='ledger.account')),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='ledger.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'timestamp', 'id'], name='ledger_archive_account_ts_idx'), models.Index(fields=['timestamp'], name='ledger_archive_ts_idx')],
+            },
+        ),
+    ]
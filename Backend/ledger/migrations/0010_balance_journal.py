@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:51
+
+import hashlib
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copies of ledger.journal's chaining as of this migration, so later
+# changes to that module cannot change what this migration writes
+GENESIS_HASH = '0' * 64
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    return f"{Decimal(value).quantize(CENT) + 0:f}"
+
+
+def entry_hash(previous_hash, account_id, sequence, kind, transaction_id, amount, balance, description, created_at):
+    fields = (
+        previous_hash, str(account_id), str(sequence), kind, '' if transaction_id is None else str(transaction_id),
+        _money(amount), _money(balance), created_at.astimezone(dt_timezone.utc).isoformat(), description,
+    )
+    return hashlib.sha256('\x1f'.join(fields).encode()).hexdigest()
+
+
+def open_journals(apps, schema_editor):
+    """Start each account's journal at its current balance."""
+    Account = apps.get_model('ledger', 'Account')
+    JournalEntry = apps.get_model('ledger', 'JournalEntry')
+    created_at = timezone.now()
+    JournalEntry.objects.bulk_create(
+        JournalEntry(
+            account_id=account_id, sequence=1, kind='open', amount=balance, balance=balance,
+            description='Opening balance', created_at=created_at, previous_hash=GENESIS_HASH,
+            hash=entry_hash(GENESIS_HASH, account_id, 1, 'open', None, balance, balance, 'Opening balance', created_at),
+        )
+        for account_id, balance in Account.objects.exclude(balance=0).values_list('id', 'balance').iterator()
+    )
+
+
+def forbid_updates(apps, schema_editor):
+    """Make journal rows immutable in the database; deletes still cascade from accounts."""
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE TRIGGER ledger_journalentry_append_only BEFORE UPDATE ON ledger_journalentry "
+            "BEGIN SELECT RAISE(ABORT, 'journal entries are append-only'); END"
+        )
+
+
+def allow_updates(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TRIGGER IF EXISTS ledger_journalentry_append_only")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0009_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal_checkpoints', to='ledger.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'sequence'], name='ledger_journal_checkpoint_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(choices=[('open', 'Opening balance'), ('post', 'Transaction posted'), ('delete', 'Transaction deleted'), ('adjust', 'Balance adjusted'), ('override', 'Balance overridden')], max_length=10)),
+                ('transaction_id', models.BigIntegerField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('previous_hash', models.CharField(max_length=64)),
+                ('hash', models.CharField(max_length=64)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal', to='ledger.account')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'sequence'), name='ledger_journal_unique_sequence')],
+            },
+        ),
+        migrations.RunPython(open_journals, migrations.RunPython.noop),
+        migrations.RunPython(forbid_updates, allow_updates),
+    ]
@@ -1,8 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from decimal import Decimal
+from .signals import balance_changed
 
 # Create your models here.
 
+def account_changed():
+    """Extra update() arguments that bump an account's version and modification time."""
+    return {'version': F('version') + 1, 'modified_at': timezone.now()}
+
+
 class User(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(max_length=100)
@@ -15,14 +23,36 @@ class Account(models.Model):
     authorized_users = models.ManyToManyField(User, related_name='authorized_accounts', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # Add this line
+    transaction_count = models.BigIntegerField(default=0)  # Maintained by the posting service
+    # Bumped by every change to the account, for ETag/Last-Modified on reads
+    version = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
     def change_balance(self, amount: Decimal):
-        """Update the balance of the account."""
-        self.balance += amount
-        self.save()
+        """Add amount to the balance in a single UPDATE and return the new balance.
+
+        The increment is done by the database, so concurrent callers never
+        overwrite each other's changes; the UPDATE only matches this
+        account's row and raises DoesNotExist if it is gone. The ORM cannot
+        return the updated value, so the balance is read back in the same
+        transaction, after the UPDATE has locked the row. The change is
+        journaled alongside. amount must be a whole number of cents, as for
+        posts.
+        """
+        from .journal import record
+        from .services import parse_amount
+
+        amount = parse_amount(amount)
+        with transaction.atomic():
+            if not Account.objects.filter(pk=self.pk).update(balance=F('balance') + amount, **account_changed()):
+                raise Account.DoesNotExist(f"Account {self.pk} does not exist.")
+            self.balance = Account.objects.values_list('balance', flat=True).get(pk=self.pk)
+            record(self.pk, [(JournalEntry.ADJUST, amount, self.balance, None, '')])
+            transaction.on_commit(lambda: balance_changed.send(sender=Account, account_ids=[self.pk]))
+        return self.balance
 
 class Transaction(models.Model):
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
@@ -31,5 +61,170 @@ class Transaction(models.Model):
     timestamp = models.DateTimeField()
     description = models.TextField()
 
+    class Meta:
+        indexes = [
+            # Account history, newest first; id breaks timestamp ties for keyset paging
+            models.Index(fields=['account', 'timestamp', 'id'], name='ledger_tx_account_ts_idx'),
+            # A creator's transactions within a date range
+            models.Index(fields=['creator', 'timestamp'], name='ledger_tx_creator_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.timestamp} - {self.amount} - {self.account.name} - {self.description}"
+
+class ArchivedTransaction(models.Model):
+    """A transaction moved out of the hot table by archive_transactions, keeping its id.
+
+    The ledger is the union of Transaction and ArchivedTransaction; archived
+    rows are never changed again.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='archived_transactions')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_transactions')
+    timestamp = models.DateTimeField()
+    description = models.TextField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'timestamp', 'id'], name='ledger_archive_account_ts_idx'),
+            models.Index(fields=['timestamp'], name='ledger_archive_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.timestamp} - {self.amount} - {self.account_id} - {self.description} (archived)"
+
+
+class OpeningBalance(models.Model):
+    """Rolled-up totals of an account's archived transactions.
+
+    Every archived transaction of the account is older than archived_through,
+    so reads that stay at or after it never touch the archive.
+    """
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, related_name='opening_balance')
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.BigIntegerField(default=0)
+    archived_through = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.account_id} opening {self.balance} before {self.archived_through}"
+
+
+class JournalEntry(models.Model):
+    """One link in an account's append-only, hash-chained journal of balance changes.
+
+    hash covers the entry's fields and the previous entry's hash, so
+    changing or removing an entry breaks every later link; see ledger/journal.py.
+    """
+    OPEN = 'open'
+    POST = 'post'
+    DELETE = 'delete'
+    ADJUST = 'adjust'
+    OVERRIDE = 'override'
+    KIND_CHOICES = [
+        (OPEN, 'Opening balance'),
+        (POST, 'Transaction posted'),
+        (DELETE, 'Transaction deleted'),
+        (ADJUST, 'Balance adjusted'),
+        (OVERRIDE, 'Balance overridden'),
+    ]
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='journal')
+    sequence = models.PositiveBigIntegerField()  # 1, 2, 3... within the account
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Not a foreign key: entries outlive deleted and archived transactions
+    transaction_id = models.BigIntegerField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)  # Change to the balance
+    balance = models.DecimalField(max_digits=14, decimal_places=2)  # Balance after the change
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    previous_hash = models.CharField(max_length=64)
+    hash = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'sequence'], name='ledger_journal_unique_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id}#{self.sequence} {self.kind} {self.amount} -> {self.balance}"
+
+
+class JournalCheckpoint(models.Model):
+    """The last journal entry of an account that verify_journal found intact."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='journal_checkpoints')
+    sequence = models.PositiveBigIntegerField()
+    hash = models.CharField(max_length=64)
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'sequence'], name='ledger_journal_checkpoint_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} verified through #{self.sequence} at {self.created_at}"
+
+
+class BalanceSnapshot(models.Model):
+    """Totals of one account's transactions for a single day or month."""
+    DAY = 'D'
+    MONTH = 'M'
+    PERIOD_CHOICES = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='snapshots')
+    period = models.CharField(max_length=1, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    credits = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Sum of positive amounts
+    debits = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Sum of negative amounts, as a positive number
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period', 'period_start'], name='ledger_snapshot_unique_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.get_period_display()} {self.period_start}: +{self.credits} -{self.debits}"
+
+
+class ReconciliationCheckpoint(models.Model):
+    """High-water marks recorded by each reconcile_balances run."""
+    last_transaction_id = models.BigIntegerField(default=0)
+    last_account_id = models.BigIntegerField(default=0)
+    accounts_checked = models.PositiveIntegerField(default=0)
+    drift_found = models.PositiveIntegerField(default=0)
+    repaired = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Reconciled through transaction {self.last_transaction_id} at {self.created_at}"
+
+
+class LedgerCounter(models.Model):
+    """A named running total, such as the number of transactions in the ledger."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class IdempotencyKey(models.Model):
+    """The stored response to a write made with an Idempotency-Key header; see ledger/idempotency.py."""
+    scope = models.CharField(max_length=50)  # The endpoint the key was used on
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of the request, so a reused key is detected
+    status_code = models.PositiveSmallIntegerField()
+    content_type = models.CharField(max_length=100)
+    body = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='ledger_idempotency_unique_key'),
+        ]
+
     def __str__(self):
-        return f"{self.timestamp} - {self.amount} - {self.account.name} - {self.description}"
\ No newline at end of file
+        return f"{self.scope} {self.key} -> {self.status_code}"
@@ -0,0 +1,112 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(position, pk):
+    """Encode the (timestamp, id) of the last row on a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{position.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) stored in a cursor, or raise ValueError."""
+    try:
+        position, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        position = parse_datetime(position)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor.")
+    if position is None:
+        raise ValueError("Invalid cursor.")
+    return position, pk
+
+
+def get_page_size(limit):
+    """Clamp a requested page size to [1, LEDGER_MAX_PAGE_SIZE], defaulting to LEDGER_PAGE_SIZE."""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return settings.LEDGER_PAGE_SIZE
+    return max(1, min(limit, settings.LEDGER_MAX_PAGE_SIZE))
+
+
+def keyset_slice(queryset, cursor, limit, field="timestamp"):
+    """Return the query for one page plus one extra row, which tells whether another page follows.
+
+    Raises ValueError for a bad cursor. Evaluate the result (synchronously or
+    with async iteration) and pass the rows to split_page.
+    """
+    queryset = queryset.order_by(f"-{field}", "-id")
+    if cursor:
+        position, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f"{field}__lt": position}) | Q(**{field: position, "id__lt": pk}))
+    return queryset[:limit + 1]
+
+
+def split_page(rows, limit, field="timestamp"):
+    """Trim the rows fetched by keyset_slice to a page and return it with the next cursor."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], field), rows[-1].id)
+
+
+def keyset_page(queryset, cursor, limit, field="timestamp"):
+    """Return one page of queryset, newest first, and the cursor for the next page.
+
+    Rows are ordered by (field, id) descending and the cursor holds the last
+    row's pair, so the next page is a range condition on an index instead of
+    an OFFSET; every page costs the same however deep the client goes. Rows
+    must expose field and id as attributes (model instances or named rows).
+    """
+    return split_page(list(keyset_slice(queryset, cursor, limit, field)), limit, field)
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination over (ordering_field, id), newest first.
+
+    Views can set cursor_ordering_field to page on a column other than
+    timestamp. Clients follow the "next" link until it is null.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    ordering_field = "timestamp"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field = getattr(view, "cursor_ordering_field", self.ordering_field)
+        try:
+            rows, self.next_cursor = keyset_page(
+                queryset,
+                request.query_params.get(self.cursor_query_param),
+                get_page_size(request.query_params.get(self.page_size_query_param)),
+                field,
+            )
+        except ValueError as e:
+            raise NotFound(str(e))
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
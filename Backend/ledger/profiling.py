@@ -0,0 +1,97 @@
+import cProfile
+import io
+import itertools
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+class ProfileStore:
+    """The most recent request profiles, newest first."""
+
+    def __init__(self):
+        self._profiles = deque()
+        self._ids = itertools.count(1)
+        self._started = deque()
+        self._lock = threading.Lock()
+        # cProfile cannot run in two threads at once on Python 3.12+
+        self.profiler_lock = threading.Lock()
+
+    def allow(self, request):
+        """Decide whether to profile this request: header or sample, then rate limit."""
+        requested = request.headers.get(settings.LEDGER_PROFILING_HEADER) == "1"
+        if not requested and random.random() >= settings.LEDGER_PROFILING_SAMPLE_RATE:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] > 60:
+                self._started.popleft()
+            if len(self._started) >= settings.LEDGER_PROFILING_MAX_PER_MINUTE:
+                return False
+            self._started.append(now)
+        return True
+
+    def add(self, request, view, response, duration, profiler, queries):
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(50)
+        with self._lock:
+            profile = {
+                "id": next(self._ids),
+                "created_at": timezone.now(),
+                "method": request.method,
+                "path": request.get_full_path(),
+                "view": view,
+                "status": response.status_code,
+                "duration_ms": duration * 1000,
+                "queries": queries,
+                "stats": stream.getvalue(),
+            }
+            self._profiles.appendleft(profile)
+            while len(self._profiles) > settings.LEDGER_PROFILES_KEPT:
+                self._profiles.pop()
+        return profile
+
+    def all(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def get(self, profile_id):
+        return next((profile for profile in self.all() if profile["id"] == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+            self._started.clear()
+
+
+profile_store = ProfileStore()
+
+
+def run_profiled(get_response, request):
+    """Handle the request under cProfile, returning the response, profiler and query log."""
+    queries = []
+
+    def log_query(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append({"sql": sql, "ms": (time.perf_counter() - started) * 1000})
+
+    profiler = cProfile.Profile()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(log_query))
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    return response, profiler, queries
@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .journal import record_override
+from .models import Account, OpeningBalance, ReconciliationCheckpoint, Transaction, account_changed
+from .signals import balance_changed
+
+CENT = Decimal('0.01')
+
+
+def expected_balance():
+    """Expression for an account's balance according to its opening balance and transactions."""
+    total = (
+        Transaction.objects.filter(account=OuterRef('pk'))
+        .order_by()
+        .values('account')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    opening = OpeningBalance.objects.filter(account=OuterRef('pk')).values('balance')
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+    return (
+        Coalesce(Subquery(total), Value(Decimal('0.00')), output_field=output_field)
+        + Coalesce(Subquery(opening), Value(Decimal('0.00')), output_field=output_field)
+    )
+
+
+def touched_accounts(checkpoint):
+    """Accounts created or posted to after the checkpoint's high-water marks."""
+    return Account.objects.filter(
+        Q(id__gt=checkpoint.last_account_id)
+        | Q(id__in=Transaction.objects.filter(id__gt=checkpoint.last_transaction_id).values('account_id'))
+    )
+
+
+def find_drift(accounts=None):
+    """Compare stored balances with their transactions in one grouped aggregate query.
+
+    Archived transactions are counted through the account's opening balance.
+    Returns the number of accounts checked and a list of
+    (account_id, stored_balance, expected_balance) for every mismatch.
+    """
+    accounts = Account.objects.all() if accounts is None else accounts
+    rows = (
+        accounts.order_by()
+        .values_list('id', 'balance', 'opening_balance__balance')
+        .annotate(expected=Sum('transaction__amount', default=0))
+    )
+    checked, drift = 0, []
+    for account_id, stored, opening, expected in rows.iterator():
+        checked += 1
+        # Aggregates over SQLite decimals come back unquantized
+        expected = (Decimal(expected) + (opening or 0)).quantize(CENT)
+        if stored != expected:
+            drift.append((account_id, stored, expected))
+    return checked, drift
+
+
+def reconcile(incremental=False, repair=False, account_ids=None):
+    """Check balances against the transaction log and record a checkpoint.
+
+    With incremental=True only accounts touched since the last checkpoint
+    are checked; balances overwritten directly (update_balance) without a
+    transaction are only caught by a full run. Runs limited to account_ids
+    do not record a checkpoint, since they say nothing about the other
+    accounts. With repair=True each drifted balance is reset by a single
+    UPDATE that recomputes the sum in the database, so posts racing with
+    the repair are not lost.
+    """
+    marks = Transaction.objects.aggregate(last_transaction_id=Max('id', default=0))
+    marks.update(Account.objects.aggregate(last_account_id=Max('id', default=0)))
+
+    accounts = Account.objects.all()
+    if account_ids:
+        accounts = accounts.filter(id__in=account_ids)
+    elif incremental:
+        checkpoint = ReconciliationCheckpoint.objects.order_by('-id').first()
+        if checkpoint is not None:
+            accounts = touched_accounts(checkpoint)
+
+    checked, drift = find_drift(accounts)
+    with transaction.atomic():
+        if repair and drift:
+            drifted = [account_id for account_id, _, _ in drift]
+            Account.objects.filter(id__in=drifted).update(balance=expected_balance(), **account_changed())
+            for account_id, balance in Account.objects.filter(id__in=drifted).values_list('id', 'balance'):
+                record_override(account_id, balance, description='reconcile_balances --repair')
+            transaction.on_commit(lambda: balance_changed.send(sender=Account, account_ids=drifted))
+        if not account_ids:
+            ReconciliationCheckpoint.objects.create(
+                accounts_checked=checked, drift_found=len(drift), repaired=repair and bool(drift), **marks
+            )
+    return checked, drift
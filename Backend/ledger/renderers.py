@@ -0,0 +1,69 @@
+"""Faster JSON encoding for the ledger API and function views.
+
+settings.LEDGER_JSON_BACKEND chooses the encoder: "orjson" uses the orjson
+package when it is installed and falls back to the standard library
+otherwise; "json" always uses the standard library. Either way the output is
+compact and Decimals are written as exact strings, never floats, so cents
+survive the round trip.
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class APIJSONEncoder(JSONEncoder):
+    """DRF's encoder, but with Decimals as strings instead of floats."""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+def use_orjson():
+    return orjson is not None and settings.LEDGER_JSON_BACKEND == 'orjson'
+
+
+def dumps(data, encoder=DjangoJSONEncoder):
+    """Encode data to compact UTF-8 JSON bytes.
+
+    Types JSON has no literal for (datetimes, Decimals, ...) are converted
+    by encoder's default(), so both backends produce the same text.
+    """
+    if use_orjson():
+        # Datetimes go through default() too, so they are formatted like the stdlib path
+        return orjson.dumps(
+            data, default=encoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(data, cls=encoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class LedgerJSONRenderer(JSONRenderer):
+    """DRF JSON renderer encoding with the configured LEDGER_JSON_BACKEND."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Pretty-printing is for humans; leave it to DRF
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like DRF, escape the two characters that are valid JSON but not valid JavaScript
+        return dumps(data, APIJSONEncoder).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class LedgerJsonResponse(HttpResponse):
+    """JsonResponse counterpart encoding with the configured LEDGER_JSON_BACKEND."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
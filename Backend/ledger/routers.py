@@ -0,0 +1,103 @@
+"""Read replica routing for the ledger.
+
+When settings.LEDGER_READ_REPLICA names a database alias, reads of ledger
+models made while ReplicaRoutingMiddleware handles a request go to that
+replica and everything else goes to the primary. A request is pinned to
+the primary once it writes, inside atomic blocks on the primary, in views
+wrapped with primary_database, and for LEDGER_REPLICA_STICKY_SECONDS after
+the client last wrote (tracked with a cookie), so clients read their own
+writes despite replication lag. Code outside a request, such as management
+commands, always uses the primary.
+"""
+import functools
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class RoutingState:
+    """Routing decisions for the request being handled."""
+    pinned: bool = False
+    wrote: bool = False
+
+
+# State of the request being handled, set by ReplicaRoutingMiddleware
+current_routing = ContextVar('current_routing', default=None)
+
+
+@contextmanager
+def use_primary():
+    """Send every read in the block to the primary."""
+    state = current_routing.get()
+    if state is None or state.pinned:
+        yield
+        return
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = state.wrote
+
+
+def primary_database(view):
+    """Run a view entirely against the primary, for views that write on safe methods."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_primary():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = settings.LEDGER_READ_REPLICA
+        if not replica or model._meta.app_label != 'ledger':
+            return None
+        state = current_routing.get()
+        if state is None or state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == DEFAULT_DB_ALIAS:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'ledger':
+            return None
+        state = current_routing.get()
+        if state is not None:
+            # Later reads in this request, and the client's next requests, must see the write
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, settings.LEDGER_READ_REPLICA}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica is a copy of the primary, schema included
+        if settings.LEDGER_READ_REPLICA and db == settings.LEDGER_READ_REPLICA:
+            return False
+        return None
+
+
+def copy_database(path, source=DEFAULT_DB_ALIAS):
+    """Copy the source SQLite database over the file at path with the online backup API.
+
+    This is the local stand-in for replication. Readers of the copy see
+    either the old or the new version, never a partial one.
+    """
+    primary = connections[source]
+    primary.ensure_connection()
+    replica = sqlite3.connect(path)
+    try:
+        primary.connection.backup(replica)
+    finally:
+        replica.close()
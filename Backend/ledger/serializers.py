@@ -1,17 +1,100 @@
-from rest_framework import serializers
+import time
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from .metrics import record_serializer_time
 from .models import User, Account, Transaction
+from .services import save_account_fields
+
+
+class TimedDataMixin:
+    """Charge the time spent building .data to the current request's metrics."""
+
+    @property
+    def data(self):
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            record_serializer_time(time.perf_counter() - started)
 
-class UserSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class UserSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
 
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Account
         fields = '__all__'
+        # Maintained by the posting service; version is also the ETag source, so clients must not set it
+        read_only_fields = ('transaction_count', 'version', 'modified_at')
+        list_serializer_class = TimedListSerializer
+
+    def update(self, instance, validated_data):
+        authorized_users = validated_data.pop('authorized_users', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        save_account_fields(instance, validated_data)
+        if authorized_users is not None:
+            instance.authorized_users.set(authorized_users)
+        return instance
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
+
+
+class TransactionRowSerializer:
+    """Read-only fast path producing the same output as TransactionSerializer(many=True).
+
+    Takes rows from Transaction.objects.values_list(*TransactionRowSerializer.fields)
+    instead of model instances and formats each one directly, skipping the
+    per-field dispatch of ModelSerializer. Amounts come back from the
+    database already quantized to the field's two places.
+    """
+    fields = ('id', 'amount', 'timestamp', 'description', 'account_id', 'creator_id')
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def data(self):
+        started = time.perf_counter()
+        try:
+            format_timestamp = self.timestamp_formatter()
+            return [
+                {
+                    "id": pk,
+                    "amount": f"{amount:f}",
+                    "timestamp": format_timestamp(timestamp),
+                    "description": description,
+                    "account": account_id,
+                    "creator": creator_id,
+                }
+                for pk, amount, timestamp, description, account_id, creator_id in self.rows
+            ]
+        finally:
+            record_serializer_time(time.perf_counter() - started)
+
+    @staticmethod
+    def timestamp_formatter():
+        """Return a function formatting datetimes the way DRF's DateTimeField does."""
+        output_format = api_settings.DATETIME_FORMAT
+        if output_format is None or output_format.lower() != ISO_8601:
+            return serializers.DateTimeField().to_representation
+        current_timezone = timezone.get_current_timezone()
+
+        def iso_timestamp(value):
+            value = value.astimezone(current_timezone).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return iso_timestamp
@@ -0,0 +1,349 @@
+import functools
+import json
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .metrics import LatencyWindow
+from .models import Account, JournalEntry, Transaction, User, account_changed
+from .counters import adjust_transaction_count
+from .journal import record as record_journal, record_override
+from .signals import balance_changed, transactions_posted, transactions_posting
+from .snapshots import apply_snapshot_deltas, snapshot_deltas
+
+CENT = Decimal('0.01')
+
+# Wall time of each successful post_transaction call
+posting_latency = LatencyWindow()
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and 'database is locked' in str(exc)
+
+
+def retry_on_locked(func):
+    """Retry func when SQLite gives up waiting for the write lock ("database is locked").
+
+    Tries settings.LEDGER_LOCKED_RETRIES more times, sleeping
+    LEDGER_LOCKED_RETRY_DELAY seconds (doubled each time, with jitter) in
+    between. Calls made inside an outer atomic block are not retried: the
+    enclosing transaction is already broken and must be retried as a whole.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = settings.LEDGER_LOCKED_RETRY_DELAY
+        for attempt in range(settings.LEDGER_LOCKED_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_locked_error(e) or connection.in_atomic_block or attempt == settings.LEDGER_LOCKED_RETRIES:
+                    raise
+            time.sleep(delay * random.uniform(1, 2))
+            delay *= 2
+    return wrapper
+
+
+@retry_on_locked
+def post_transaction(account, amount: Decimal, description, creator, timestamp=None):
+    """Record a transaction and apply it to the account balance atomically.
+
+    amount must be a whole number of cents, as for bulk posts. The balance
+    UPDATE runs first so it takes the account's row lock before anything
+    else is written; the insert, the balance change, the account's
+    daily/monthly snapshots and the transaction counters commit or roll
+    back together. Returns the saved Transaction and the new balance.
+    """
+    amount = parse_amount(amount)
+    started = time.perf_counter()
+    with transaction.atomic():
+        updated = Account.objects.filter(pk=account.pk).update(
+            balance=F('balance') + amount, transaction_count=F('transaction_count') + 1,
+            **account_changed(),
+        )
+        if not updated:
+            raise Account.DoesNotExist(f"Account {account.pk} does not exist.")
+        posted = Transaction.objects.create(
+            account=account,
+            amount=amount,
+            description=description,
+            creator=creator,
+            timestamp=timestamp or timezone.now(),
+        )
+        apply_snapshot_deltas(snapshot_deltas([posted]))
+        adjust_transaction_count(1, account_id=account.pk)
+        account.balance = Account.objects.values_list('balance', flat=True).get(pk=account.pk)
+        record_journal(account.pk, [(JournalEntry.POST, amount, account.balance, posted.pk, description)])
+        transactions_posting.send(sender=Transaction, transactions=[posted])
+        transaction.on_commit(lambda: transactions_posted.send(sender=Transaction, transactions=[posted]))
+    posting_latency.observe(time.perf_counter() - started)
+    return posted, account.balance
+
+
+@retry_on_locked
+def delete_transaction(tx):
+    """Delete a transaction and reverse it from the balance, snapshots and counters atomically.
+
+    Like posting, the balance UPDATE runs first to take the account's row
+    lock. Returns the account's new balance.
+    """
+    with transaction.atomic():
+        Account.objects.filter(pk=tx.account_id).update(
+            balance=F('balance') - tx.amount, transaction_count=F('transaction_count') - 1,
+            **account_changed(),
+        )
+        deleted, _ = Transaction.objects.filter(pk=tx.pk).delete()
+        if not deleted:
+            raise Transaction.DoesNotExist(f"Transaction {tx.pk} does not exist.")
+        apply_snapshot_deltas(snapshot_deltas([tx], sign=-1))
+        adjust_transaction_count(-1, account_id=tx.account_id)
+        balance = Account.objects.values_list('balance', flat=True).get(pk=tx.account_id)
+        record_journal(tx.account_id, [(JournalEntry.DELETE, -tx.amount, balance, tx.pk, tx.description)])
+        transaction.on_commit(lambda: balance_changed.send(sender=Transaction, account_ids=[tx.account_id]))
+    return balance
+
+
+@retry_on_locked
+def amend_transaction(tx, **changes):
+    """Change fields of a posted transaction and move balances, snapshots and counters to match, atomically.
+
+    changes are Transaction fields (account, amount, creator, timestamp,
+    description). The old posting is reversed and the amended one applied
+    in one database transaction: the transaction row is locked and re-read
+    first, then each affected account is updated in id order. Returns the
+    amended Transaction.
+    """
+    if 'amount' in changes:
+        changes['amount'] = parse_amount(changes['amount'])
+    with transaction.atomic():
+        old = Transaction.objects.select_for_update().get(pk=tx.pk)
+        for field, value in changes.items():
+            setattr(tx, field, value)
+        tx.amount = parse_amount(tx.amount)
+
+        moves = defaultdict(lambda: [Decimal(0), 0])
+        moves[old.account_id][0] -= old.amount
+        moves[old.account_id][1] -= 1
+        moves[tx.account_id][0] += tx.amount
+        moves[tx.account_id][1] += 1
+        for account_id in sorted(moves):
+            delta, count = moves[account_id]
+            # Bumps the version even when only the description changed, since the history did
+            Account.objects.filter(pk=account_id).update(
+                balance=F('balance') + delta, transaction_count=F('transaction_count') + count,
+                **account_changed(),
+            )
+        tx.save()
+
+        deltas = snapshot_deltas([old], sign=-1)
+        for key, (credits, debits, count) in snapshot_deltas([tx]).items():
+            deltas[key][0] += credits
+            deltas[key][1] += debits
+            deltas[key][2] += count
+        apply_snapshot_deltas({key: delta for key, delta in deltas.items() if any(delta)})
+
+        if old.account_id != tx.account_id or old.amount != tx.amount:
+            balances = dict(Account.objects.filter(pk__in=moves).values_list('id', 'balance'))
+            reversed_balance = balances[old.account_id] - (tx.amount if old.account_id == tx.account_id else 0)
+            record_journal(old.account_id, [
+                (JournalEntry.DELETE, -old.amount, reversed_balance, old.pk, old.description),
+            ])
+            record_journal(tx.account_id, [
+                (JournalEntry.POST, tx.amount, balances[tx.account_id], tx.pk, tx.description),
+            ])
+        account_ids = list(moves)
+        transaction.on_commit(lambda: balance_changed.send(sender=Transaction, account_ids=account_ids))
+    return tx
+
+
+class BulkValidationError(ValueError):
+    """Raised when one or more rows of a bulk post are invalid."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid row(s)")
+        self.errors = errors
+
+
+def parse_bulk_rows(stream, content_type):
+    """Decode a JSON array, or NDJSON with one object per line, into a list of rows."""
+    if stream is None:
+        # DRF has no stream for an empty body
+        raise ValueError("The request body is empty.")
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        return [json.loads(line) for line in stream if line.strip()]
+    rows = json.loads(stream.read())
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of transactions.")
+    return rows
+
+
+def parse_amount(value):
+    """Return value as a Decimal of whole cents, raising ValueError if it is not one."""
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}") from None
+    if not amount.is_finite() or amount.as_tuple().exponent < -2 or abs(amount) >= 10 ** 8:
+        raise ValueError(f"Invalid amount: {value!r}")
+    return amount.quantize(CENT)
+
+
+def validate_bulk_rows(rows):
+    """Check every row in one pass and return unsaved Transaction objects.
+
+    Each row needs account, amount and description; creator defaults to the
+    account owner and timestamp to now. Accounts and creators are loaded with
+    one query each, however many rows there are. All problems are collected
+    and raised together as a BulkValidationError.
+    """
+    objects = [row for row in rows if isinstance(row, dict)]
+    account_ids = {row.get("account") for row in objects if isinstance(row.get("account"), int)}
+    creator_ids = {row.get("creator") for row in objects if isinstance(row.get("creator"), int)}
+    accounts = Account.objects.only("id", "owner_id").in_bulk(account_ids)
+    creators = set(User.objects.filter(pk__in=creator_ids).values_list("pk", flat=True))
+    now = timezone.now()
+    current_timezone = timezone.get_current_timezone()
+
+    transactions, errors = [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"row": index, "error": "Expected an object."})
+            continue
+        account_id = row.get("account")
+        account = accounts.get(account_id) if isinstance(account_id, int) else None
+        if account is None:
+            errors.append({"row": index, "error": "Unknown account."})
+            continue
+        creator_id = row.get("creator", account.owner_id)
+        if creator_id != account.owner_id and not (isinstance(creator_id, int) and creator_id in creators):
+            errors.append({"row": index, "error": "Unknown creator."})
+            continue
+        try:
+            amount = parse_amount(row.get("amount"))
+        except ValueError:
+            errors.append({"row": index, "error": "Invalid amount."})
+            continue
+        description = row.get("description")
+        if not isinstance(description, str) or not description:
+            errors.append({"row": index, "error": "Missing description."})
+            continue
+        timestamp = now
+        if row.get("timestamp") is not None:
+            try:
+                timestamp = parse_datetime(str(row["timestamp"]))
+            except ValueError:
+                # Well formed but impossible, such as February 30th
+                timestamp = None
+            if timestamp is None:
+                errors.append({"row": index, "error": "Invalid timestamp."})
+                continue
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp, current_timezone)
+        transactions.append(Transaction(
+            account_id=account.pk,
+            amount=amount,
+            creator_id=creator_id,
+            timestamp=timestamp,
+            description=description,
+        ))
+
+    if errors:
+        raise BulkValidationError(errors)
+    return transactions
+
+
+@retry_on_locked
+def post_transactions_bulk(rows, batch_size=None):
+    """Validate and post many transactions in one database transaction.
+
+    Each account's balance is moved by a single UPDATE carrying the sum of
+    its amounts, which also locks the accounts before anything else is
+    written. Rows are then inserted with bulk_create in batches of
+    batch_size (default settings.LEDGER_BULK_BATCH_SIZE) and the snapshots
+    are updated in bulk. Returns the number of rows created and the new
+    balance of every touched account.
+    """
+    transactions = validate_bulk_rows(rows)
+    batch_size = batch_size or settings.LEDGER_BULK_BATCH_SIZE
+
+    deltas = defaultdict(Decimal)
+    counts = defaultdict(int)
+    for tx in transactions:
+        deltas[tx.account_id] += tx.amount
+        counts[tx.account_id] += 1
+
+    with transaction.atomic():
+        for account_id, delta in deltas.items():
+            Account.objects.filter(pk=account_id).update(
+                balance=F('balance') + delta, transaction_count=F('transaction_count') + counts[account_id],
+                **account_changed(),
+            )
+        Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        apply_snapshot_deltas(snapshot_deltas(transactions))
+        for account_id, count in counts.items():
+            adjust_transaction_count(count, account_id=account_id)
+        balances = dict(Account.objects.filter(pk__in=deltas).values_list('id', 'balance'))
+        _journal_bulk(transactions, balances, deltas)
+        transactions_posting.send(sender=Transaction, transactions=transactions)
+        transaction.on_commit(lambda: transactions_posted.send(sender=Transaction, transactions=transactions))
+    return len(transactions), balances
+
+
+def _journal_bulk(transactions, balances, deltas):
+    """Journal a bulk post, one entry per transaction with the balance it left behind."""
+    entries = defaultdict(list)
+    running = {account_id: balances[account_id] - delta for account_id, delta in deltas.items()}
+    for tx in transactions:
+        running[tx.account_id] += tx.amount
+        entries[tx.account_id].append(
+            (JournalEntry.POST, tx.amount, running[tx.account_id], tx.pk, tx.description)
+        )
+    for account_id, account_entries in entries.items():
+        record_journal(account_id, account_entries)
+
+
+@retry_on_locked
+def override_balance(account, new_balance, description=''):
+    """Set an account's balance outright, journaling the override, and return it.
+
+    new_balance must be a whole number of cents, as for posts.
+    """
+    new_balance = parse_amount(new_balance)
+    with transaction.atomic():
+        Account.objects.filter(pk=account.pk).update(balance=new_balance, **account_changed())
+        account.balance = Account.objects.values_list('balance', flat=True).get(pk=account.pk)
+        record_override(account.pk, account.balance, description=description)
+        transaction.on_commit(lambda: balance_changed.send(sender=Account, account_ids=[account.pk]))
+    return account.balance
+
+
+def save_account_fields(account, fields):
+    """Save only the named fields of an edited account and bump its version.
+
+    A full save() would write back the balance, count and version the
+    instance was loaded with, undoing posts that committed since.
+    """
+    account.save(update_fields=[*fields, 'modified_at'])
+    Account.objects.filter(pk=account.pk).update(**account_changed())
+
+
+def save_account(serializer, description=''):
+    """Save an account through its API serializer, journaling the balance if it was set.
+
+    Edits that leave the balance alone are not journaled: the instance may
+    have been loaded before a post committed, and its balance is stale. A
+    set balance is read back from the row, as override_balance does.
+    """
+    creating = serializer.instance is None
+    with transaction.atomic():
+        account = serializer.save()
+        if creating or 'balance' in serializer.validated_data:
+            account.balance = Account.objects.values_list('balance', flat=True).get(pk=account.pk)
+            record_override(account.pk, account.balance, description=description)
+    return account
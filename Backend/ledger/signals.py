@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Sent inside a posting's database transaction, before it commits, with transactions=[Transaction, ...]
+transactions_posting = Signal()
+
+# Sent once a posting has committed, with transactions=[Transaction, ...]
+transactions_posted = Signal()
+
+# Sent once a balance or counter has changed outside a posting, with account_ids=[...]
+balance_changed = Signal()
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedTransaction, BalanceSnapshot, Transaction
+
+SNAPSHOT_BATCH_SIZE = 1000
+CENT = Decimal('0.01')
+
+
+def period_keys(account_id, timestamp):
+    """Return the (account, period, period_start) keys a transaction falls into."""
+    day = timezone.localdate(timestamp)
+    return (
+        (account_id, BalanceSnapshot.DAY, day),
+        (account_id, BalanceSnapshot.MONTH, day.replace(day=1)),
+    )
+
+
+def snapshot_deltas(transactions, sign=1):
+    """Sum transactions into {key: [credits, debits, count]} for apply_snapshot_deltas.
+
+    Use sign=-1 to build the deltas that remove the transactions again.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    for tx in transactions:
+        for key in period_keys(tx.account_id, tx.timestamp):
+            delta = deltas[key]
+            if tx.amount >= 0:
+                delta[0] += sign * tx.amount
+            else:
+                delta[1] -= sign * tx.amount
+            delta[2] += sign
+    return deltas
+
+
+def apply_snapshot_deltas(deltas):
+    """Add deltas to the stored snapshots, creating rows for new periods.
+
+    Callers must already hold the row locks of the affected accounts (the
+    posting service updates their balances first), which is what makes
+    this read-modify-write safe against concurrent posts.
+    """
+    if not deltas:
+        return
+    account_ids = {account_id for account_id, _, _ in deltas}
+    starts = {period_start for _, _, period_start in deltas}
+    existing = {
+        (snapshot.account_id, snapshot.period, snapshot.period_start): snapshot
+        for snapshot in BalanceSnapshot.objects.filter(account_id__in=account_ids, period_start__in=starts)
+    }
+
+    changed, created = [], []
+    for key, (credits, debits, count) in deltas.items():
+        snapshot = existing.get(key)
+        if snapshot is None:
+            account_id, period, period_start = key
+            snapshot = BalanceSnapshot(account_id=account_id, period=period, period_start=period_start)
+            created.append(snapshot)
+        else:
+            changed.append(snapshot)
+        snapshot.credits += credits
+        snapshot.debits += debits
+        snapshot.transaction_count += count
+
+    BalanceSnapshot.objects.bulk_update(
+        changed, ['credits', 'debits', 'transaction_count'], batch_size=SNAPSHOT_BATCH_SIZE
+    )
+    BalanceSnapshot.objects.bulk_create(created, batch_size=SNAPSHOT_BATCH_SIZE)
+
+
+def _daily_totals(transactions):
+    return (
+        transactions.annotate(day=TruncDate('timestamp'))
+        .values('account_id', 'day')
+        .annotate(
+            credits=Sum('amount', filter=Q(amount__gt=0), default=0),
+            debits=Sum('amount', filter=Q(amount__lt=0), default=0),
+            transaction_count=Count('id'),
+        )
+        .order_by()
+    )
+
+
+def rebuild_snapshots(account_ids=None):
+    """Recompute snapshots from the transaction log and return how many rows were written.
+
+    Daily totals come from one grouped aggregate over the transactions (and
+    one over the archive) and monthly totals are rolled up from those, so
+    the ledger is scanned once.
+    """
+    sources = [Transaction.objects.all(), ArchivedTransaction.objects.all()]
+    snapshots = BalanceSnapshot.objects.all()
+    if account_ids is not None:
+        sources = [transactions.filter(account_id__in=account_ids) for transactions in sources]
+        snapshots = snapshots.filter(account_id__in=account_ids)
+
+    days = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    months = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+    for transactions in sources:
+        for row in _daily_totals(transactions).iterator():
+            for totals in (days[(row['account_id'], row['day'])],
+                           months[(row['account_id'], row['day'].replace(day=1))]):
+                totals[0] += row['credits']
+                totals[1] -= row['debits']
+                totals[2] += row['transaction_count']
+    rows = [
+        BalanceSnapshot(
+            account_id=account_id, period=period, period_start=period_start,
+            credits=credits, debits=debits, transaction_count=count,
+        )
+        for period, totals in ((BalanceSnapshot.DAY, days), (BalanceSnapshot.MONTH, months))
+        for (account_id, period_start), (credits, debits, count) in totals.items()
+    ]
+
+    with transaction.atomic():
+        snapshots.delete()
+        BalanceSnapshot.objects.bulk_create(rows, batch_size=SNAPSHOT_BATCH_SIZE)
+    return len(rows)
+
+
+def balance_as_of(account_id, day):
+    """Return the sum of an account's transactions up to and including day.
+
+    Reads whole months before day's month and single days within it, so at
+    most about 31 + months-of-history snapshot rows instead of the ledger.
+    """
+    month_start = day.replace(day=1)
+    totals = BalanceSnapshot.objects.filter(
+        Q(period=BalanceSnapshot.MONTH, period_start__lt=month_start)
+        | Q(period=BalanceSnapshot.DAY, period_start__gte=month_start, period_start__lte=day),
+        account_id=account_id,
+    ).aggregate(credits=Sum('credits', default=0), debits=Sum('debits', default=0))
+    return (totals['credits'] - totals['debits']).quantize(CENT)
+
+
+def monthly_totals(account_id, year=None):
+    """Return the account's monthly snapshots, oldest first, optionally for one year."""
+    months = BalanceSnapshot.objects.filter(account_id=account_id, period=BalanceSnapshot.MONTH)
+    if year is not None:
+        months = months.filter(period_start__year=year)
+    return months.order_by('period_start')
@@ -1,3 +1,1527 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .archive import archive_transactions
+from .benchmarking import benchmark_requests, load_test_asgi, load_test_wsgi
+from .cache import cache_stats, cached, ledger_cache
+from .counters import repair_counters, transaction_count
+from .events import OVERFLOW, broadcaster
+from .idempotency import idempotent, request_fingerprint
+from .journal import entry_hash, verify_journal
+from .metrics import view_metrics
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    User, Account, Transaction, ArchivedTransaction, OpeningBalance, BalanceSnapshot, LedgerCounter,
+    ReconciliationCheckpoint, JournalEntry, JournalCheckpoint, IdempotencyKey,
+)
+from .profiling import profile_store
+from .reconciliation import find_drift, reconcile
+from .renderers import APIJSONEncoder, LedgerJsonResponse, dumps, orjson
+from .routers import ReplicaRouter, RoutingState, copy_database, current_routing, primary_database
+from .serializers import AccountSerializer, TransactionRowSerializer, TransactionSerializer
+from .services import delete_transaction, post_transaction, posting_latency, retry_on_locked, save_account
+from .snapshots import apply_snapshot_deltas, balance_as_of, rebuild_snapshots
+
+
+class ChangeBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+
+    def test_returns_new_balance(self):
+        self.assertEqual(self.account.change_balance(Decimal("12.50")), Decimal("12.50"))
+        self.assertEqual(self.account.change_balance(Decimal("-2.25")), Decimal("10.25"))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("10.25"))
+
+    def test_one_update_and_one_read(self):
+        self.account.change_balance(Decimal("1.00"))
+        with CaptureQueriesContext(connection) as captured:
+            self.account.change_balance(Decimal("1.00"))
+        statements = [query["sql"].split()[0] for query in captured]
+        self.assertEqual(statements.count("UPDATE"), 1)
+        self.assertEqual(self.account.balance, Decimal("2.00"))
+
+    def test_deleted_account_raises(self):
+        Account.objects.filter(pk=self.account.pk).delete()
+        with self.assertRaises(Account.DoesNotExist):
+            self.account.change_balance(Decimal("1.00"))
+
+    def test_rejects_sub_cent_amounts(self):
+        for name in ("change_balance", "update_balance"):
+            body = self.client.get(reverse(name, args=[self.account.pk, "0.004"])).json()
+            self.assertEqual(body["status"], "error", name)
+        with self.assertRaises(ValueError):
+            self.account.change_balance(Decimal("0.004"))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("0.00"))
+        self.assertFalse(JournalEntry.objects.exists())
+
+    def test_stale_instance_does_not_overwrite(self):
+        stale = Account.objects.get(pk=self.account.pk)
+        self.account.change_balance(Decimal("5.00"))
+        stale.change_balance(Decimal("1.00"))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("6.00"))
+
+
+class ChangeBalanceConcurrencyTests(TransactionTestCase):
+    workers = 16
+    posts = 400
+
+    def test_concurrent_writers_lose_no_updates(self):
+        user = User.objects.create(name="Test User", email="test@example.com")
+        account = Account.objects.create(name="Checking Account", owner=user)
+        amounts = [Decimal(i % 7) + Decimal("0.25") for i in range(self.posts)]
+
+        def post(amount):
+            try:
+                Account.objects.get(pk=account.pk).change_balance(amount)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(post, amounts))
+
+        account.refresh_from_db()
+        self.assertEqual(account.balance, sum(amounts))
+
+
+@override_settings(LEDGER_LOCKED_RETRIES=2, LEDGER_LOCKED_RETRY_DELAY=0)
+class RetryOnLockedTests(SimpleTestCase):
+    def flaky(self, *errors):
+        errors = list(errors)
+        calls = []
+
+        @retry_on_locked
+        def write():
+            calls.append(1)
+            if errors:
+                raise errors.pop(0)
+            return "done"
+        return write, calls
+
+    def test_retries_until_the_lock_is_free(self):
+        write, calls = self.flaky(OperationalError("database is locked"), OperationalError("database is locked"))
+        self.assertEqual(write(), "done")
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_the_configured_retries(self):
+        write, calls = self.flaky(*[OperationalError("database is locked")] * 3)
+        with self.assertRaisesMessage(OperationalError, "database is locked"):
+            write()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        write, calls = self.flaky(OperationalError("no such table: ledger_account"))
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+class RetryInsideAtomicTests(TestCase):
+    @override_settings(LEDGER_LOCKED_RETRY_DELAY=0)
+    def test_not_retried_inside_an_outer_transaction(self):
+        calls = []
+
+        @retry_on_locked
+        def write():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with transaction.atomic(), self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+class PostTransactionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+
+    def test_posts_row_and_balance_together(self):
+        posted, new_balance = post_transaction(self.account, Decimal("20.00"), "Dues", self.user)
+        self.assertEqual(new_balance, Decimal("20.00"))
+        self.assertEqual(Transaction.objects.get().pk, posted.pk)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("20.00"))
+
+    def test_failed_insert_rolls_back_balance(self):
+        with self.assertRaises(IntegrityError):
+            post_transaction(self.account, Decimal("20.00"), None, self.user)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("0.00"))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_records_latency(self):
+        posting_latency.reset()
+        post_transaction(self.account, Decimal("1.00"), "Snacks", self.user)
+        stats = self.client.get(reverse("posting_stats")).json()["posting"]
+        self.assertEqual(stats["count"], 1)
+        self.assertGreater(stats["p99"], 0)
+
+    def test_create_transaction_view(self):
+        url = reverse("create_transaction", args=[self.account.pk, "12.34", "Pizza"])
+        body = self.client.get(url).json()
+        self.assertEqual(body["status"], "success")
+        self.assertEqual(body["new_balance"], "12.34")
+        self.assertEqual(Transaction.objects.get(pk=body["transaction_id"]).creator, self.user)
+
+    def test_viewset_create_updates_balance(self):
+        response = self.client.post("/api/transactions/", {
+            "account": self.account.pk,
+            "creator": self.user.pk,
+            "amount": "-5.50",
+            "description": "Refund",
+            "timestamp": "2025-04-01T12:00:00Z",
+        })
+        self.assertEqual(response.status_code, 201)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("-5.50"))
+
+    def test_rejects_sub_cent_amounts(self):
+        with self.assertRaises(ValueError):
+            post_transaction(self.account, Decimal("1.005"), "Dues", self.user)
+        body = self.client.get(reverse("create_transaction", args=[self.account.pk, "1.005", "Dues"])).json()
+        self.assertEqual(body["status"], "error")
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_viewset_update_amends_posting(self):
+        savings = Account.objects.create(name="Savings Account", owner=self.user)
+        posted, _ = post_transaction(self.account, Decimal("10.00"), "Dues", self.user)
+        version = Account.objects.get(pk=self.account.pk).version
+        url = f"/api/transactions/{posted.pk}/"
+        response = self.client.patch(url, {"amount": "50.00"}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("50.00"))
+        self.assertGreater(self.account.version, version)
+
+        self.client.patch(url, {"account": savings.pk}, content_type="application/json")
+        self.assertEqual(
+            dict(Account.objects.values_list("name", "balance")),
+            {"Checking Account": Decimal("0.00"), "Savings Account": Decimal("50.00")},
+        )
+        self.assertEqual(find_drift()[1], [])
+        self.assertEqual(repair_counters(dry_run=True), [])
+        self.assertEqual(verify_journal()[1], [])
+        snapshots = sorted(BalanceSnapshot.objects.filter(transaction_count__gt=0).values_list(
+            "account", "period", "period_start", "credits", "debits", "transaction_count"))
+        rebuild_snapshots()
+        self.assertEqual(sorted(BalanceSnapshot.objects.values_list(
+            "account", "period", "period_start", "credits", "debits", "transaction_count")), snapshots)
+
+
+class BulkCreateTransactionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.checking = Account.objects.create(name="Checking Account", owner=self.user)
+        self.savings = Account.objects.create(name="Savings Account", owner=self.user)
+        self.url = reverse("bulk_create_transactions")
+
+    def test_json_array(self):
+        rows = [
+            {"account": self.checking.pk, "amount": "10.00", "description": "Dues"},
+            {"account": self.checking.pk, "amount": "-2.50", "description": "Snacks", "creator": self.user.pk},
+            {"account": self.savings.pk, "amount": 100, "description": "Deposit",
+             "timestamp": "2025-03-01T09:30:00-05:00"},
+        ]
+        response = self.client.post(self.url + "?batch_size=2", json.dumps(rows), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["created"], 3)
+        self.assertEqual(body["balances"], {str(self.checking.pk): "7.50", str(self.savings.pk): "100.00"})
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_ndjson_stream(self):
+        lines = "\n".join(
+            json.dumps({"account": self.savings.pk, "amount": "1.25", "description": f"Row {i}"}) for i in range(50)
+        )
+        response = self.client.post(self.url, lines, content_type="application/x-ndjson")
+        self.assertEqual(response.json()["created"], 50)
+        self.savings.refresh_from_db()
+        self.assertEqual(self.savings.balance, Decimal("62.50"))
+
+    def test_empty_body(self):
+        for content_type in ("application/json", "application/x-ndjson"):
+            response = self.client.post(self.url, "", content_type=content_type)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["message"], "The request body is empty.")
+
+    def test_invalid_rows_reject_whole_batch(self):
+        rows = [
+            {"account": self.checking.pk, "amount": "10.00", "description": "Dues"},
+            {"account": 9999, "amount": "1.00", "description": "Ghost"},
+            {"account": self.checking.pk, "amount": "1.001", "description": "Too precise"},
+            {"account": self.checking.pk, "amount": "1.00", "description": "Bad time", "timestamp": "yesterday"},
+            {"account": self.checking.pk, "amount": "1.00", "description": "No such day",
+             "timestamp": "2025-02-30T00:00:00"},
+        ]
+        response = self.client.post(self.url, json.dumps(rows), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["row"] for error in response.json()["errors"]], [1, 2, 3, 4])
+        self.assertEqual(response.json()["errors"][3]["error"], "Invalid timestamp.")
+        self.assertFalse(Transaction.objects.exists())
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal("0.00"))
+
+    def test_session_users_need_csrf_token(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(AuthUser.objects.create_user("treasurer", "test@example.com", "secret"))
+        rows = json.dumps([{"account": self.checking.pk, "amount": "1.00", "description": "Dues"}])
+        self.assertEqual(client.post(self.url, rows, content_type="application/json").status_code, 403)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.url = reverse("create_transaction", args=[self.account.pk, "10.00", "Dues"])
+
+    def post(self, url, key, **kwargs):
+        return self.client.get(url, HTTP_IDEMPOTENCY_KEY=key, **kwargs)
+
+    def test_retry_is_answered_from_stored_response(self):
+        first = self.post(self.url, "abc")
+        with self.assertNumQueries(1):
+            retry = self.post(self.url, "abc")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("10.00"))
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_failures_are_not_stored(self):
+        url = reverse("create_transaction", args=[self.account.pk, "abc", "Dues"])
+        self.assertEqual(self.post(url, "abc").json()["status"], "error")
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_key_reused_for_different_request_is_refused(self):
+        self.post(self.url, "abc")
+        other = reverse("create_transaction", args=[self.account.pk, "20.00", "Dues"])
+        self.assertEqual(self.post(other, "abc").status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_bulk_and_api_retries(self):
+        bulk = json.dumps([{"account": self.account.pk, "amount": "1.00", "description": "Dues"}])
+        api = {"account": self.account.pk, "creator": self.user.pk, "amount": "2.00", "description": "Dues",
+               "timestamp": "2025-03-01T09:30:00Z"}
+        for _ in range(2):
+            bulk_response = self.client.post(reverse("bulk_create_transactions"), bulk,
+                                             content_type="application/json", HTTP_IDEMPOTENCY_KEY="abc")
+            api_response = self.client.post(reverse("transaction-list"), api, content_type="application/json",
+                                            HTTP_IDEMPOTENCY_KEY="abc")
+            self.assertEqual(bulk_response.json()["created"], 1)
+            self.assertEqual(api_response.status_code, 201)
+        self.assertEqual(api_response["Idempotent-Replayed"], "true")
+        self.assertEqual(api_response.json()["amount"], "2.00")
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_losing_a_race_rolls_back_and_replays_the_winner(self):
+        first = self.post(self.url, "abc")
+        winner = IdempotencyKey.objects.get()
+
+        @idempotent("create-transaction")
+        def view(request):
+            # A concurrent request with the key commits between our lookup and our post
+            IdempotencyKey.objects.create(scope=winner.scope, key=winner.key, fingerprint=winner.fingerprint,
+                                          status_code=winner.status_code, content_type=winner.content_type,
+                                          body=winner.body)
+            post_transaction(self.account, Decimal("10.00"), "Dues", self.user)
+            return LedgerJsonResponse({"status": "success"})
+
+        winner.delete()
+        response = view(RequestFactory().get(self.url, HTTP_IDEMPOTENCY_KEY="abc"))
+        self.assertEqual(json.loads(response.content), first.json())
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_retry_before_the_response_is_stored_is_a_conflict(self):
+        IdempotencyKey.objects.create(scope="create-transaction", key="abc", status_code=0, content_type="claim",
+                                      fingerprint=request_fingerprint(RequestFactory().get(self.url)), body=b"")
+        self.assertEqual(self.post(self.url, "abc").status_code, 409)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_expired_keys_are_reused_and_purged(self):
+        self.post(self.url, "abc")
+        self.post(self.url, "def")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertIsNone(self.post(self.url, "abc").get("Idempotent-Replayed"))
+        self.assertEqual(Transaction.objects.count(), 3)
+        out = io.StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1 expired", out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["abc"])
+
+
+@override_settings(LEDGER_LOCKED_RETRY_DELAY=0)
+class IdempotentLockRetryTests(TransactionTestCase):
+    def test_posting_retries_a_locked_database_under_a_key(self):
+        user = User.objects.create(name="Test User", email="test@example.com")
+        account = Account.objects.create(name="Checking Account", owner=user)
+        errors = [OperationalError("database is locked")]
+
+        def flaky(deltas):
+            if errors:
+                raise errors.pop()
+            return apply_snapshot_deltas(deltas)
+
+        body = json.dumps([{"account": account.pk, "amount": "1.00", "description": "Dues"}])
+        with mock.patch("ledger.services.apply_snapshot_deltas", flaky):
+            first = self.client.post(reverse("bulk_create_transactions"), body, content_type="application/json",
+                                     HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertFalse(errors)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["created"], 1)
+        retry = self.client.post(reverse("bulk_create_transactions"), body, content_type="application/json",
+                                 HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class ReadQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.accounts = [Account.objects.create(name=f"Account {i}", owner=self.user) for i in range(3)]
+
+    def add_transactions(self, count):
+        creators = [User.objects.create(name=f"Member {i}", email=f"m{i}@example.com") for i in range(3)]
+        Transaction.objects.bulk_create(
+            Transaction(account=self.accounts[i % 3], creator=creators[i % 3], amount=Decimal("1.00"),
+                        description=f"Row {i}", timestamp=timezone.now())
+            for i in range(count)
+        )
+
+    def count_queries(self, url):
+        ledger_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_history_query_count_is_constant(self):
+        url = reverse("get_transaction_history", args=[self.accounts[0].pk])
+        # The router's /api/transactions/<pk>/ once shadowed this path; make sure the right view is measured
+        self.assertEqual(resolve(url).func.__name__, "get_transaction_history")
+        self.add_transactions(3)
+        small = self.count_queries(url)
+        self.add_transactions(60)
+        self.assertEqual(self.count_queries(url), small)
+
+    def test_index_query_count_is_constant(self):
+        self.add_transactions(3)
+        small = self.count_queries(reverse("index"))
+        self.add_transactions(60)
+        self.assertEqual(self.count_queries(reverse("index")), small)
+
+
+class CachedReadTests(TestCase):
+    def setUp(self):
+        ledger_cache().clear()
+        cache_stats.reset()
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+
+    def test_repeated_reads_hit_the_cache(self):
+        # The account detail still reads the account's version for its ETag
+        for url, expected in ((reverse("index"), 0), (reverse("accounts"), 0), ("/api/accounts/", 0),
+                              (f"/api/accounts/{self.account.pk}/", 1)):
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(len(queries), expected, url)
+        stats = cache_stats.snapshot()
+        for name in ("index", "accounts", "account-list", "account-detail"):
+            self.assertEqual(stats[name], {"hit": 1, "miss": 1}, name)
+
+    def test_posting_invalidates(self):
+        detail = f"/api/accounts/{self.account.pk}/"
+        self.assertEqual(self.client.get(detail).json()["balance"], "0.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("create_transaction", args=[self.account.pk, "5.00", "Dues"]))
+        self.assertEqual(self.client.get(detail).json()["balance"], "5.00")
+        self.assertContains(self.client.get(reverse("index")), "Dues")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("change_balance", args=[self.account.pk, "2.50"]))
+        self.assertEqual(self.client.get(detail).json()["balance"], "7.50")
+
+    def test_account_writes_invalidate(self):
+        self.assertEqual(len(self.client.get("/api/accounts/").json()["results"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Account.objects.create(name="Savings", owner=self.user)
+        self.assertEqual(len(self.client.get("/api/accounts/").json()["results"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("update_balance", args=[self.account.pk, "9.00"]))
+        self.assertEqual(self.client.get(f"/api/accounts/{self.account.pk}/").json()["balance"], "9.00")
+
+    def test_invalidates_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.name = "New"
+            self.account.save()
+            # A concurrent reader still sees the committed name and caches it before the write commits
+            cached("names", lambda: ["Checking Account"])
+        self.assertEqual(cached("names", lambda: [self.account.name]), ["New"])
+
+    def test_repairs_invalidate(self):
+        post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal("1.00"), transaction_count=3)
+        def listed():
+            # Served from the cache without reading the account
+            return self.client.get("/api/accounts/").json()["results"][0]
+
+        self.assertEqual(listed()["balance"], "1.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            reconcile(repair=True)
+        self.assertEqual(listed()["balance"], "5.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            repair_counters()
+        self.assertEqual(listed()["transaction_count"], 1)
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            caches = {
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "ledger": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory},
+            }
+            with self.settings(CACHES=caches):
+                self.client.get(reverse("accounts"))
+                self.assertTrue(os.listdir(directory))
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse("accounts"))
+                self.assertEqual(len(queries), 0)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        ledger_cache().clear()
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.history = reverse("get_transaction_history", args=[self.account.pk])
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_history_is_not_modified_without_reading_transactions(self):
+        response = self.client.get(self.history)
+        self.assertIn("Last-Modified", response)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.revalidate(self.history, response).status_code, 304)
+        self.assertFalse(any("ledger_transaction" in query["sql"] for query in queries.captured_queries))
+        self.assertEqual(
+            self.client.get(self.history, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304
+        )
+
+    def test_writes_change_the_validators(self):
+        for url in (self.history, "/api/accounts/", f"/api/accounts/{self.account.pk}/", reverse("accounts")):
+            response = self.client.get(url)
+            with self.captureOnCommitCallbacks(execute=True):
+                post_transaction(self.account, Decimal("1.00"), "Dues", self.user)
+            self.assertEqual(self.revalidate(url, response).status_code, 200, url)
+            self.assertEqual(self.revalidate(url, self.client.get(url)).status_code, 304, url)
+
+    def test_account_changes_change_the_validators(self):
+        response = self.client.get("/api/accounts/")
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Account.objects.create(name="Savings", owner=self.user)
+        response = self.client.get("/api/accounts/")
+        self.assertEqual(len(response.json()["results"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(self.revalidate("/api/accounts/", response).status_code, 200)
+
+        detail = f"/api/accounts/{self.account.pk}/"
+        response = self.client.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.authorized_users.add(self.user)
+        self.assertEqual(self.revalidate(detail, response).status_code, 200)
+
+    def test_non_numeric_ids_are_not_found(self):
+        self.assertEqual(self.client.get("/api/accounts/abc/").status_code, 404)
+
+    def test_clients_cannot_rewind_the_etag(self):
+        detail = f"/api/accounts/{self.account.pk}/"
+        original = self.client.get(detail)
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.account, Decimal("1.00"), "Dues", self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail, {"version": 0}, content_type="application/json")
+        self.assertGreater(Account.objects.get(pk=self.account.pk).version, 1)
+        self.assertEqual(self.revalidate(detail, original).status_code, 200)
+
+    def test_pages_have_distinct_etags(self):
+        first = self.client.get(self.history + "?limit=1")
+        self.assertNotEqual(first["ETag"], self.client.get(self.history + "?limit=2")["ETag"])
+
+    def test_missing_account_is_still_404(self):
+        url = reverse("get_transaction_history", args=[999])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH="*").status_code, 404)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.account.authorized_users.add(self.user)
+        Account.objects.create(name="Savings Account", owner=self.user)
+        for i in range(5):
+            post_transaction(self.account, Decimal(i), f"Row {i}", self.user)
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        return response.status_code, response.getvalue()
+
+    async def assertSameBody(self, sync_url, async_url):
+        status, body = await sync_to_async(self.fetch)(sync_url)
+        response = await self.async_client.get(async_url)
+        self.assertEqual(response.status_code, status)
+        if response.streaming:
+            self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]), body)
+        else:
+            self.assertEqual(response.content, body)
+        return response
+
+    async def test_history_matches_sync_view(self):
+        sync_url = reverse("get_transaction_history", args=[self.account.pk])
+        async_url = reverse("async_transaction_history", args=[self.account.pk])
+        response = await self.assertSameBody(sync_url + "?limit=2", async_url + "?limit=2")
+        cursor = json.loads(response.content)["next_cursor"]
+        await self.assertSameBody(f"{sync_url}?limit=2&cursor={cursor}", f"{async_url}?limit=2&cursor={cursor}")
+        await self.assertSameBody(sync_url + "?cursor=bogus", async_url + "?cursor=bogus")
+        missing = await self.async_client.get(reverse("async_transaction_history", args=[999]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_history_is_not_modified_until_the_account_changes(self):
+        url = reverse("async_transaction_history", args=[self.account.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        revalidated = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        await sync_to_async(post_transaction)(self.account, Decimal("1.00"), "Dues", self.user)
+        revalidated = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(revalidated.status_code, 200)
+
+    async def test_accounts_match_viewset(self):
+        response = await self.async_client.get(reverse("async_accounts") + "?limit=1")
+        expected = await sync_to_async(self.client.get)("/api/accounts/?limit=1")
+        body, expected = json.loads(response.content), expected.json()
+        self.assertEqual(body["results"], expected["results"])
+        self.assertIn(reverse("async_accounts"), body["next"])
+
+    async def test_export_matches_sync_view(self):
+        for query in ("", "?format=ndjson", f"?account={self.account.pk}", "?format=xml"):
+            await self.assertSameBody(reverse("export_transactions") + query,
+                                      reverse("async_export_transactions") + query)
+
+
+# Uses committed data, since the load tests query from their own threads
+class TransactionEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.other = Account.objects.create(name="Savings Account", owner=self.user)
+        self.url = reverse("transaction_events")
+
+    def post(self, account, description):
+        with self.captureOnCommitCallbacks(execute=True):
+            tx, _ = post_transaction(account, Decimal("5"), description, self.user)
+        return tx
+
+    def publish(self, transactions):
+        with self.assertNumQueries(0):
+            broadcaster.publish(transactions)
+
+    async def test_stream_delivers_posts_for_one_account(self):
+        response = await self.async_client.get(f"{self.url}?account={self.account.pk}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        received = asyncio.Queue()
+
+        async def consume():
+            async for chunk in response.streaming_content:
+                await received.put(chunk)
+
+        task = asyncio.create_task(consume())
+        try:
+            self.assertEqual(await asyncio.wait_for(received.get(), 1), b"retry: 3000\n\n")
+            await sync_to_async(self.post)(self.other, "Elsewhere")
+            await sync_to_async(self.post)(self.account, "Lunch")
+            event = await asyncio.wait_for(received.get(), 1)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        fields = dict(line.split(": ", 1) for line in event.decode().strip().split("\n"))
+        tx = await Transaction.objects.aget(description="Lunch")
+        self.assertEqual(fields["id"], str(tx.pk))
+        self.assertEqual(fields["event"], "transaction")
+        data = json.loads(fields["data"])
+        self.assertEqual((data["description"], data["amount"], data["account"]), ("Lunch", "5.00", self.account.pk))
+        self.assertTrue(received.empty())
+        # Disconnecting cancels the stream, which drops its subscription
+        self.assertEqual(broadcaster.subscriber_count(), 0)
+
+    async def test_one_post_reaches_every_subscriber_without_queries(self):
+        subscriptions = [broadcaster.subscribe(), broadcaster.subscribe(self.account.pk)]
+        try:
+            tx = await sync_to_async(self.post)(self.account, "Lunch")
+            await sync_to_async(self.publish)([tx])
+            first, second = [await asyncio.wait_for(s.queue.get(), 1) for s in subscriptions]
+            self.assertIs(first, second)
+        finally:
+            for subscription in subscriptions:
+                broadcaster.unsubscribe(subscription)
+
+    @override_settings(LEDGER_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_subscriber_is_cut_off(self):
+        subscription = broadcaster.subscribe()
+        try:
+            tx = await sync_to_async(self.post)(self.account, "Lunch")
+            await sync_to_async(broadcaster.publish)([tx, tx, tx])
+            await asyncio.sleep(0)
+            self.assertNotEqual(subscription.queue.get_nowait(), OVERFLOW)
+            self.assertIs(subscription.queue.get_nowait(), OVERFLOW)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    def test_requires_asgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+    async def test_unknown_account(self):
+        response = await self.async_client.get(f"{self.url}?account=999")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(LEDGER_READ_REPLICA="replica")
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.view)
+        self.reads = []
+        self.write = False
+
+    def view(self, request):
+        if self.write:
+            self.router.db_for_write(Transaction)
+        self.reads.append(self.router.db_for_read(Account))
+        return HttpResponse()
+
+    def test_reads_go_to_the_replica_during_requests(self):
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(self.reads, ["replica"])
+        self.assertNotIn(settings.LEDGER_REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_reads_outside_requests_and_of_other_apps_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Account), "default")
+        token = current_routing.set(RoutingState())
+        try:
+            self.assertIsNone(self.router.db_for_read(AuthUser))
+        finally:
+            current_routing.reset(token)
+
+    def test_write_pins_the_request_and_sets_the_sticky_cookie(self):
+        self.write = True
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(self.reads, ["default"])
+        cookie = response.cookies[settings.LEDGER_REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.LEDGER_REPLICA_STICKY_SECONDS)
+
+        self.write = False
+        self.factory.cookies[settings.LEDGER_REPLICA_STICKY_COOKIE] = "1"
+        self.middleware(self.factory.get("/"))
+        self.assertEqual(self.reads, ["default", "default"])
+
+    def test_unsafe_methods_and_writing_views_use_the_primary(self):
+        self.middleware(self.factory.post("/"))
+        ReplicaRoutingMiddleware(primary_database(self.view))(self.factory.get("/"))
+        self.assertEqual(self.reads, ["default", "default"])
+
+    def test_cache_is_filled_from_the_primary(self):
+        ledger_cache().clear()
+        self.middleware = ReplicaRoutingMiddleware(
+            lambda request: HttpResponse(cached("routing-test", lambda: self.router.db_for_read(Account)))
+        )
+        self.assertEqual(self.middleware(self.factory.get("/")).content, b"default")
+
+    @override_settings(LEDGER_READ_REPLICA=None)
+    def test_disabled_without_a_replica(self):
+        self.write = True
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(self.reads, [None])
+        self.assertNotIn(settings.LEDGER_REPLICA_STICKY_COOKIE, response.cookies)
+
+
+class ReplicaCopyTests(TransactionTestCase):
+    def test_copy_database(self):
+        user = User.objects.create(name="Test User", email="test@example.com")
+        Account.objects.create(name="Checking Account", owner=user)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replica.sqlite3")
+            copy_database(path)
+            replica = sqlite3.connect(path)
+            try:
+                rows = replica.execute(f"SELECT name FROM {Account._meta.db_table}").fetchall()
+            finally:
+                replica.close()
+        self.assertEqual(rows, [("Checking Account",)])
+
+
+class LoadTestHelperTests(TransactionTestCase):
+    # Outside a test transaction, requests read the replica when one is configured
+    databases = "__all__"
+
+    def test_wsgi_and_asgi_load_tests(self):
+        user = User.objects.create(name="Test User", email="test@example.com")
+        account = Account.objects.create(name="Checking Account", owner=user)
+        post_transaction(account, Decimal("1.00"), "Dues", user)
+        for name in ("get_transaction_history", "async_transaction_history"):
+            url = reverse(name, args=[account.pk])
+            for result in (load_test_wsgi(url, clients=4, workers=2), load_test_asgi(url, clients=4)):
+                self.assertEqual(result["requests"], 4)
+                self.assertGreater(result["throughput_rps"], 0)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        # Groups of rows share a timestamp so the id tie-breaker matters
+        base = timezone.now()
+        Transaction.objects.bulk_create(
+            Transaction(account=self.account, creator=self.user, amount=Decimal(i), description=f"Row {i}",
+                        timestamp=base - timedelta(minutes=i // 4))
+            for i in range(25)
+        )
+
+    def test_history_pages_cover_every_row_once(self):
+        url = reverse("get_transaction_history", args=[self.account.pk])
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+            body = self.client.get(url, params).json()
+            seen += [tx["description"] for tx in body["transactions"]]
+            cursor, pages = body["next_cursor"], pages + 1
+            if cursor is None:
+                break
+        self.assertEqual(pages, 4)
+        self.assertEqual(sorted(seen), sorted(f"Row {i}" for i in range(25)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_history_rejects_bad_cursor(self):
+        url = reverse("get_transaction_history", args=[self.account.pk])
+        self.assertEqual(self.client.get(url, {"cursor": "not-a-cursor"}).status_code, 400)
+
+    def test_viewset_follows_next_links(self):
+        url, ids = "/api/transactions/?limit=10", []
+        while url:
+            body = self.client.get(url).json()
+            ids += [tx["id"] for tx in body["results"]]
+            url = body["next"]
+        self.assertEqual(sorted(ids), sorted(Transaction.objects.values_list("id", flat=True)))
+
+    def test_account_viewset_is_paginated(self):
+        Account.objects.create(name="Savings Account", owner=self.user)
+        body = self.client.get("/api/accounts/?limit=1").json()
+        self.assertEqual([account["name"] for account in body["results"]], ["Savings Account"])
+        self.assertIsNotNone(body["next"])
+
+
+class TransactionRowSerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        for amount, timestamp in (
+            (Decimal("5"), datetime(2025, 1, 15, 12, 30, tzinfo=dt_timezone.utc)),
+            (Decimal("-0.10"), datetime(2025, 7, 1, 3, 0, 0, 250000, tzinfo=dt_timezone.utc)),
+            (Decimal("1234567.89"), timezone.now()),
+        ):
+            post_transaction(self.account, amount, "Row \u00e9", self.user, timestamp)
+
+    def assertSameOutput(self):
+        transactions = Transaction.objects.order_by("id")
+        expected = TransactionSerializer(transactions, many=True).data
+        actual = TransactionRowSerializer(transactions.values_list(*TransactionRowSerializer.fields)).data
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_matches_model_serializer(self):
+        self.assertSameOutput()
+        with timezone.override("UTC"):
+            self.assertSameOutput()
+
+    @override_settings(REST_FRAMEWORK={"DATETIME_FORMAT": "%Y-%m-%d %H:%M"})
+    def test_matches_custom_datetime_format(self):
+        self.assertSameOutput()
+
+    def test_viewset_list_uses_rows(self):
+        response = self.client.get("/api/transactions/?limit=2")
+        expected = TransactionSerializer(Transaction.objects.order_by("-timestamp", "-id")[:2], many=True).data
+        self.assertEqual(response.json()["results"], json.loads(json.dumps(expected)))
+        self.assertEqual(len(self.client.get(response.json()["next"]).json()["results"]), 1)
+
+
+class JSONRendererTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        post_transaction(self.account, Decimal("10.10"), "Caf\u00e9 \u2028 run", self.user,
+                         datetime(2025, 1, 15, 12, 30, 0, 123456, tzinfo=dt_timezone.utc))
+        post_transaction(self.account, Decimal("-0.05"), "Refund", self.user)
+        self.payload = {"amount": Decimal("0.10"), "when": timezone.now(), "day": date(2025, 1, 2), "ids": [1, 2]}
+
+    def test_decimals_stay_strings(self):
+        self.assertEqual(json.loads(dumps({"amount": Decimal("1234567.10")})), {"amount": "1234567.10"})
+        self.assertEqual(json.loads(dumps({"amount": Decimal("0.10")}, APIJSONEncoder)), {"amount": "0.10"})
+
+    def test_stdlib_backend_matches_django_encoder(self):
+        with self.settings(LEDGER_JSON_BACKEND="json"):
+            encoded = dumps(self.payload)
+        self.assertEqual(json.loads(encoded), json.loads(json.dumps(self.payload, cls=DjangoJSONEncoder)))
+        self.assertNotIn(b", ", encoded)
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_backends_produce_identical_output(self):
+        urls = [
+            reverse("get_transaction_history", args=[self.account.pk]),
+            "/api/transactions/",
+            f"/api/accounts/{self.account.pk}/",
+        ]
+        for url in urls:
+            ledger_cache().clear()
+            with self.settings(LEDGER_JSON_BACKEND="json"):
+                expected = self.client.get(url).content
+            ledger_cache().clear()
+            with self.settings(LEDGER_JSON_BACKEND="orjson"):
+                self.assertEqual(self.client.get(url).content, expected, url)
+        self.assertEqual(dumps(self.payload), json.dumps(self.payload, cls=DjangoJSONEncoder,
+                                                         separators=(",", ":")).encode())
+
+    def test_api_output_matches_default_renderer(self):
+        response = self.client.get("/api/transactions/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn(b"\\u2028", response.content)
+        with self.settings(REST_FRAMEWORK={}):
+            self.assertEqual(self.client.get("/api/transactions/").content, response.content)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.checking = Account.objects.create(name="Checking Account", owner=self.user)
+        self.savings = Account.objects.create(name="Savings Account", owner=self.user)
+        for day, account in ((1, self.checking), (2, self.savings), (3, self.checking)):
+            Transaction.objects.create(
+                account=account, creator=self.user, amount=Decimal("1.50"), description=f'Day {day}, "quoted"',
+                timestamp=timezone.make_aware(datetime(2025, 3, day, 12)),
+            )
+
+    def export(self, **params):
+        response = self.client.get(reverse("export_transactions"), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export())))
+        self.assertEqual(rows[0], ["id", "account", "creator", "amount", "timestamp", "description"])
+        self.assertEqual([row[5] for row in rows[1:]], ['Day 1, "quoted"', 'Day 2, "quoted"', 'Day 3, "quoted"'])
+        self.assertEqual(rows[1][3], "1.50")
+
+    def test_ndjson_filtered_by_account_and_dates(self):
+        body = self.export(format="ndjson", account=self.checking.pk, start="2025-03-02", end="2025-03-03")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["description"] for row in rows], ['Day 3, "quoted"'])
+
+    def test_rejects_unknown_format(self):
+        response = self.client.get(reverse("export_transactions"), {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(LEDGER_READ_REPLICA="replica")
+    def test_streamed_reads_are_routed_like_the_request(self):
+        # The rows are read after ReplicaRoutingMiddleware returns; they must still go where the request reads
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            if model._meta.app_label == "ledger":
+                routed.append(current_routing.get() is not None)
+            return "default"
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", db_for_read):
+            self.assertEqual(len(self.export().splitlines()), 4)
+
+            async def async_export():
+                response = await self.async_client.get(reverse("async_export_transactions"))
+                return b"".join([chunk async for chunk in response.streaming_content])
+            self.assertEqual(len(async_to_sync(async_export)().splitlines()), 4)
+        self.assertEqual(routed, [True, True])
+
+    def test_management_command(self):
+        out = io.StringIO()
+        call_command("export_ledger", format="ndjson", account=self.savings.pk, stdout=out)
+        self.assertEqual([json.loads(line)["account"] for line in out.getvalue().splitlines()], [self.savings.pk])
+
+
+class BalanceSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        for day, amount in ((date(2025, 1, 31), "100.00"), (date(2025, 2, 3), "-30.00"),
+                            (date(2025, 2, 3), "5.00"), (date(2025, 2, 20), "-10.00")):
+            post_transaction(self.account, Decimal(amount), "Snapshot", self.user,
+                             timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=23)))
+
+    def snapshot_rows(self):
+        return list(BalanceSnapshot.objects.order_by("period", "period_start").values_list(
+            "period", "period_start", "credits", "debits", "transaction_count"))
+
+    def test_posting_maintains_daily_and_monthly_totals(self):
+        february = BalanceSnapshot.objects.get(period=BalanceSnapshot.MONTH, period_start=date(2025, 2, 1))
+        self.assertEqual((february.credits, february.debits, february.transaction_count),
+                         (Decimal("5.00"), Decimal("40.00"), 3))
+        self.assertEqual(BalanceSnapshot.objects.filter(period=BalanceSnapshot.DAY).count(), 3)
+
+    def test_balance_as_of(self):
+        self.assertEqual(balance_as_of(self.account.pk, date(2025, 1, 30)), Decimal("0.00"))
+        self.assertEqual(balance_as_of(self.account.pk, date(2025, 2, 3)), Decimal("75.00"))
+        self.assertEqual(balance_as_of(self.account.pk, date(2025, 12, 31)), Decimal("65.00"))
+
+    def test_rebuild_matches_incremental(self):
+        incremental = self.snapshot_rows()
+        call_command("rebuild_snapshots", stdout=io.StringIO())
+        self.assertEqual(self.snapshot_rows(), incremental)
+
+    def test_bulk_post_updates_snapshots(self):
+        rows = [{"account": self.account.pk, "amount": "-1.00", "description": "Bulk",
+                 "timestamp": "2025-02-03T12:00:00"}] * 4
+        self.client.post(reverse("bulk_create_transactions"), json.dumps(rows), content_type="application/json")
+        day = BalanceSnapshot.objects.get(period=BalanceSnapshot.DAY, period_start=date(2025, 2, 3))
+        self.assertEqual((day.debits, day.transaction_count), (Decimal("34.00"), 6))
+
+    def test_summary_view(self):
+        url = reverse("account_summary", args=[self.account.pk])
+        body = self.client.get(url, {"as_of": "2025-01-31", "year": "2025"}).json()
+        self.assertEqual(body["balance_as_of"], "100.00")
+        self.assertEqual([month["month"] for month in body["months"]], ["2025-01", "2025-02"])
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.other = Account.objects.create(name="Savings Account", owner=self.user)
+        self.horizon = timezone.make_aware(datetime(2025, 1, 1))
+        for month in range(1, 7):
+            for account in (self.account, self.other):
+                post_transaction(account, Decimal(month) + Decimal("0.25"), f"Month {month}", self.user,
+                                 timestamp=timezone.make_aware(datetime(2024, 8, 1) + timedelta(days=30 * month)))
+        self.history_url = reverse("get_transaction_history", args=[self.account.pk])
+
+    def history(self, limit=2):
+        """Page through the account's history, returning the descriptions and queries per page."""
+        descriptions, queries, cursor = [], [], None
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            with CaptureQueriesContext(connection) as captured:
+                body = self.client.get(self.history_url, params).json()
+            queries.append(len(captured))
+            descriptions += [tx["description"] for tx in body["transactions"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return descriptions, queries
+
+    def export(self, **params):
+        return b"".join(self.client.get(reverse("export_transactions"), params).streaming_content).decode()
+
+    def test_archive_keeps_balances_counters_and_snapshots(self):
+        snapshots = list(BalanceSnapshot.objects.order_by("id").values_list("account", "period_start", "credits"))
+        self.assertEqual(archive_transactions(self.horizon, batch_size=4), 10)
+
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(ArchivedTransaction.objects.count(), 10)
+        opening = OpeningBalance.objects.get(account=self.account)
+        self.assertEqual(opening.balance, Decimal("16.25"))
+        self.assertEqual((opening.transaction_count, opening.archived_through), (5, self.horizon))
+        self.account.refresh_from_db()
+        self.assertEqual((self.account.balance, self.account.transaction_count), (Decimal("22.50"), 6))
+        self.assertEqual(find_drift(), (2, []))
+        self.assertEqual(repair_counters(dry_run=True), [])
+        rebuild_snapshots()
+        self.assertCountEqual(
+            BalanceSnapshot.objects.values_list("account", "period_start", "credits"), snapshots
+        )
+
+    def test_history_reads_the_archive_only_when_needed(self):
+        post_transaction(self.account, Decimal("1"), "Recent", self.user,
+                         timestamp=timezone.make_aware(datetime(2025, 2, 15)))
+        before, before_queries = self.history(limit=1)
+        archive_transactions(self.horizon)
+        # Backdated posts stay in the hot table and are merged in order
+        post_transaction(self.account, Decimal("1"), "Backdated", self.user,
+                         timestamp=timezone.make_aware(datetime(2024, 11, 1)))
+
+        after, queries = self.history(limit=1)
+        self.assertEqual(after, before[:4] + ["Backdated"] + before[4:])
+        # A page the hot table can fill costs no more than before archiving
+        self.assertEqual(queries[0], before_queries[0])
+        self.assertEqual(queries[-1], before_queries[-1] + 1)
+
+    async def test_async_history_spans_the_archive(self):
+        await sync_to_async(archive_transactions)(self.horizon)
+        response = await self.async_client.get(reverse("async_transaction_history", args=[self.account.pk]))
+        self.assertEqual([tx["description"] for tx in json.loads(response.content)["transactions"]],
+                         [f"Month {month}" for month in range(6, 0, -1)])
+
+    def test_export_spans_the_archive(self):
+        everything, account = self.export(), self.export(account=self.account.pk, format="ndjson")
+        archive_transactions(self.horizon)
+        self.assertEqual(self.export(), everything)
+        self.assertEqual(self.export(account=self.account.pk, format="ndjson"), account)
+        recent = self.export(start="2025-01-01")
+        self.assertEqual([row[5] for row in csv.reader(io.StringIO(recent))][1:], ["Month 6", "Month 6"])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("archive_transactions", "--before", "2024-10-01", "--dry-run", stdout=out)
+        self.assertIn("4 transaction(s)", out.getvalue())
+        call_command("archive_transactions", "--before", "2024-10-01", stdout=out)
+        self.assertEqual(ArchivedTransaction.objects.count(), 4)
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.checking = Account.objects.create(name="Checking Account", owner=self.user)
+        self.savings = Account.objects.create(name="Savings Account", owner=self.user)
+        for amount in ("0.10", "0.20", "12.34"):
+            post_transaction(self.checking, Decimal(amount), "Dues", self.user)
+            post_transaction(self.savings, Decimal(amount), "Dues", self.user)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command("reconcile_balances", *args, stdout=out)
+        return out.getvalue()
+
+    def test_clean_ledger_has_no_drift(self):
+        self.assertIn("found 0 with drift", self.reconcile())
+
+    def test_reports_and_repairs_override(self):
+        self.client.get(reverse("update_balance", args=[self.savings.pk, "999.99"]))
+        self.assertIn(f"Account {self.savings.pk}: stored 999.99, transactions sum to 12.64", self.reconcile())
+        self.reconcile("--repair")
+        self.savings.refresh_from_db()
+        self.assertEqual(self.savings.balance, Decimal("12.64"))
+        self.assertIn("found 0 with drift", self.reconcile())
+
+    def test_incremental_checks_only_touched_accounts(self):
+        self.reconcile()
+        self.assertIn("Checked 0 accounts", self.reconcile("--incremental"))
+        post_transaction(self.checking, Decimal("1.00"), "Snacks", self.user)
+        self.assertIn("Checked 1 accounts", self.reconcile("--incremental"))
+        self.assertEqual(ReconciliationCheckpoint.objects.count(), 3)
+
+
+class JournalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        post_transaction(self.account, Decimal("10.00"), "Dues", self.user)
+        self.tx, _ = post_transaction(self.account, Decimal("-2.50"), "Snacks", self.user)
+
+    def verify(self, *args):
+        out = io.StringIO()
+        call_command("verify_journal", *args, stdout=out)
+        return out.getvalue()
+
+    def entries(self):
+        return list(JournalEntry.objects.filter(account=self.account).order_by("sequence").values_list(
+            "sequence", "kind", "amount", "balance"))
+
+    def test_every_balance_change_is_chained(self):
+        delete_transaction(self.tx)
+        self.account.change_balance(Decimal("1.00"))
+        self.client.get(reverse("update_balance", args=[self.account.pk, "20.00"]))
+        self.client.patch(reverse("account-detail", args=[self.account.pk]), {"balance": "25.00"},
+                          content_type="application/json")
+        self.assertEqual(self.entries(), [
+            (1, JournalEntry.POST, Decimal("10.00"), Decimal("10.00")),
+            (2, JournalEntry.POST, Decimal("-2.50"), Decimal("7.50")),
+            (3, JournalEntry.DELETE, Decimal("2.50"), Decimal("10.00")),
+            (4, JournalEntry.ADJUST, Decimal("1.00"), Decimal("11.00")),
+            (5, JournalEntry.OVERRIDE, Decimal("9.00"), Decimal("20.00")),
+            (6, JournalEntry.OVERRIDE, Decimal("5.00"), Decimal("25.00")),
+        ])
+        self.assertEqual(verify_journal(), (6, []))
+
+    def test_bulk_posts_are_chained(self):
+        self.client.post(reverse("bulk_create_transactions"), [
+            {"account": self.account.pk, "amount": "1.00", "description": "A"},
+            {"account": self.account.pk, "amount": "2.00", "description": "B"},
+        ], content_type="application/json")
+        self.assertEqual([balance for *_, balance in self.entries()][-2:], [Decimal("8.50"), Decimal("10.50")])
+        self.assertEqual(verify_journal(), (4, []))
+
+    def test_verification_resumes_from_checkpoint(self):
+        self.assertIn("Checked 2 journal entries", self.verify())
+        self.assertIn("Checked 0 journal entries", self.verify())
+        post_transaction(self.account, Decimal("1.00"), "Dues", self.user)
+        self.assertIn("Checked 1 journal entries", self.verify())
+        self.assertIn("Checked 3 journal entries", self.verify("--full"))
+        self.assertEqual(list(JournalCheckpoint.objects.values_list("sequence", flat=True).order_by("id")), [2, 3])
+
+    def test_entries_cannot_be_updated(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            JournalEntry.objects.filter(account=self.account).update(amount=Decimal("100.00"))
+
+    def test_detects_rewritten_entry(self):
+        self.verify()
+        entry = JournalEntry.objects.get(account=self.account, sequence=1)
+        entry.delete()
+        entry.amount = Decimal("100.00")
+        entry.save(force_insert=True)
+        # Incremental runs trust what was verified before the checkpoint
+        self.assertEqual(verify_journal(), (0, []))
+        self.assertEqual(verify_journal(full=True)[1], [(self.account.pk, "entry #1 was altered")])
+        with self.assertRaisesMessage(CommandError, "1 accounts failed verification"):
+            self.verify("--full")
+
+    def test_detects_rewritten_checkpointed_entry(self):
+        self.verify()
+        JournalEntry.objects.filter(account=self.account, sequence=2).delete()
+        self.assertEqual(verify_journal()[1], [(self.account.pk, "entry #2 no longer matches its checkpoint")])
+
+    def test_detects_missing_entry(self):
+        JournalEntry.objects.filter(account=self.account, sequence=1).delete()
+        self.assertEqual(verify_journal()[1], [(self.account.pk, "entries #1-#1 are missing")])
+
+    def test_detects_balance_changed_outside_the_journal(self):
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal("99.00"))
+        self.assertEqual(verify_journal()[1], [
+            (self.account.pk, "balance 99.00 differs from the journal's 7.50"),
+        ])
+        self.assertFalse(JournalCheckpoint.objects.exists())
+
+    def test_migration_chains_like_the_journal(self):
+        # Journals opened by the migration must keep verifying after changes to ledger.journal
+        migration = importlib.import_module("ledger.migrations.0010_balance_journal")
+        args = (migration.GENESIS_HASH, 3, 1, "open", None, Decimal("-0.00"), Decimal("12.50"), "Opening balance",
+                timezone.now())
+        self.assertEqual(migration.entry_hash(*args), entry_hash(*args))
+
+    def test_seeded_ledger_verifies(self):
+        call_command("seed_data", users=2, accounts_per_user=2, transactions_per_account=5, days=5,
+                     stdout=io.StringIO())
+        self.assertEqual(verify_journal()[1], [])
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(AuthUser.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.tx, _ = post_transaction(self.account, Decimal("10.00"), "Dues", self.user)
+
+    def test_account_edit_leaves_balance_and_counters(self):
+        response = self.client.post(reverse("admin:ledger_account_change", args=[self.account.pk]), {
+            "name": "Renamed", "owner": self.user.pk, "balance": "99.00", "transaction_count": 5, "version": 0,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.account.refresh_from_db()
+        self.assertEqual((self.account.name, self.account.balance, self.account.transaction_count),
+                         ("Renamed", Decimal("10.00"), 1))
+        self.assertEqual(verify_journal(), (1, []))
+
+    def test_transaction_edits_go_through_the_services(self):
+        when = self.tx.timestamp.strftime("%Y-%m-%d"), self.tx.timestamp.strftime("%H:%M:%S")
+        response = self.client.post(reverse("admin:ledger_transaction_change", args=[self.tx.pk]), {
+            "account": self.account.pk, "amount": "4.00", "creator": self.user.pk,
+            "timestamp_0": when[0], "timestamp_1": when[1], "description": "Dues",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("4.00"))
+
+        self.client.post(reverse("admin:ledger_transaction_changelist"), {
+            "action": "delete_selected", "_selected_action": [self.tx.pk], "post": "yes",
+        })
+        self.account.refresh_from_db()
+        self.assertEqual((self.account.balance, self.account.transaction_count), (Decimal("0.00"), 0))
+        self.assertEqual(find_drift()[1], [])
+        self.assertEqual(verify_journal(), (4, []))
+
+    def test_ledger_rows_are_read_only(self):
+        entry = JournalEntry.objects.get()
+        self.assertEqual(self.client.get(reverse("admin:ledger_journalentry_add")).status_code, 403)
+        response = self.client.post(reverse("admin:ledger_journalentry_change", args=[entry.pk]), {"amount": "1.00"})
+        self.assertEqual(response.status_code, 403)
+        counter = LedgerCounter.objects.first()
+        self.assertEqual(self.client.post(reverse("admin:ledger_ledgercounter_delete", args=[counter.pk]),
+                                          {"post": "yes"}).status_code, 403)
+
+    def test_account_delete_takes_its_journal(self):
+        response = self.client.get(reverse("admin:ledger_account_delete", args=[self.account.pk]))
+        self.assertFalse(response.context["perms_lacking"])
+
+
+class TransactionCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.other = Account.objects.create(name="Savings Account", owner=self.user)
+
+    def counts(self):
+        self.account.refresh_from_db()
+        self.other.refresh_from_db()
+        return self.account.transaction_count, self.other.transaction_count, transaction_count()
+
+    def test_counters_follow_posts_and_deletes(self):
+        posted, _ = post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        post_transaction(self.other, Decimal("1.00"), "Dues", self.user)
+        self.client.post(
+            reverse("bulk_create_transactions"),
+            [{"account": self.account.pk, "amount": "1.00", "description": "Bulk"}] * 3,
+            content_type="application/json",
+        )
+        self.assertEqual(self.counts(), (4, 1, 5))
+
+        delete_transaction(posted)
+        self.assertEqual(self.counts(), (3, 1, 4))
+        self.assertEqual(self.account.balance, Decimal("3.00"))
+        self.assertEqual(repair_counters(), [])
+
+    def test_api_cannot_set_counters_or_version(self):
+        post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        version = Account.objects.get(pk=self.account.pk).version
+        response = self.client.patch(
+            reverse("account-detail", args=[self.account.pk]),
+            {"name": "Renamed", "transaction_count": 999, "version": 0, "modified_at": "2000-01-01T00:00:00Z"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.name, "Renamed")
+        self.assertEqual(self.account.transaction_count, 1)
+        self.assertEqual(self.account.version, version + 1)
+        self.assertGreater(self.account.modified_at.year, 2000)
+
+    def test_api_edit_keeps_concurrent_posts(self):
+        # The viewset loaded the account before this post committed
+        stale = Account.objects.get(pk=self.account.pk)
+        post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        serializer = AccountSerializer(stale, data={"name": "Renamed"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        save_account(serializer, description="accounts API")
+        self.assertEqual(self.counts()[0], 1)
+        self.assertEqual(self.account.balance, Decimal("5.00"))
+        self.assertEqual(verify_journal(), (1, []))
+
+        serializer = AccountSerializer(stale, data={"balance": "7.00"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        save_account(serializer, description="accounts API")
+        self.assertEqual(self.counts()[0], 1)
+        self.assertEqual(verify_journal(), (1, []))
+        entries = JournalEntry.objects.filter(account=self.account).order_by("sequence")
+        self.assertEqual(list(entries.values_list("kind", "balance")),
+                         [(JournalEntry.POST, Decimal("5.00")), (JournalEntry.OVERRIDE, Decimal("7.00"))])
+
+    def test_viewset_delete_reverses_the_transaction(self):
+        posted, _ = post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        self.assertEqual(self.client.delete(f"/api/transactions/{posted.pk}/").status_code, 204)
+        self.assertEqual(self.counts(), (0, 0, 0))
+        self.assertEqual(self.account.balance, Decimal("0.00"))
+        self.assertEqual(balance_as_of(self.account.pk, timezone.localdate()), Decimal("0.00"))
+
+    def test_deleting_an_account_updates_the_global_count(self):
+        post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        post_transaction(self.other, Decimal("1.00"), "Dues", self.user)
+        self.other.delete()
+        self.assertEqual(transaction_count(), 1)
+
+    @override_settings(LEDGER_COUNTER_STRIPES=4)
+    def test_counter_is_striped_by_account(self):
+        accounts = [self.account, self.other] + [
+            Account.objects.create(name=f"Account {i}", owner=self.user) for i in range(4)
+        ]
+        for account in accounts * 2:
+            post_transaction(account, Decimal("1.00"), "Dues", self.user)
+        self.assertEqual(LedgerCounter.objects.count(), 4)
+        self.assertEqual(transaction_count(), 12)
+        delete_transaction(Transaction.objects.filter(account=self.other).first())
+        self.assertEqual(transaction_count(), 11)
+        LedgerCounter.objects.update(value=0)
+        self.assertEqual(repair_counters(), [("transactions", 0, 11)])
+        self.assertEqual(transaction_count(), 11)
+
+    def test_repair(self):
+        post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        Transaction.objects.create(account=self.other, creator=self.user, amount=1, description="Raw",
+                                   timestamp=timezone.now())
+        LedgerCounter.objects.update(value=0)
+        LedgerCounter.objects.filter(name="transactions").update(value=7)
+        expected = [(f"account {self.other.pk}", 0, 1), ("transactions", 7, 2)]
+        self.assertEqual(repair_counters(dry_run=True), expected)
+        out = io.StringIO()
+        call_command("repair_counters", stdout=out)
+        self.assertIn("Repaired 2 drifted counter(s)", out.getvalue())
+        self.assertEqual(self.counts(), (1, 1, 2))
+
+    def test_dashboard_counts_without_scanning(self):
+        ledger_cache().clear()
+        post_transaction(self.account, Decimal("5.00"), "Dues", self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("index"))
+        self.assertContains(response, "Count: 1")
+        self.assertFalse(any(
+            "COUNT(" in query["sql"] and "ledger_transaction" in query["sql"] for query in queries.captured_queries
+        ))
+        self.assertContains(self.client.get(reverse("accounts")), "<td>Checking Account</td>")
+
+    @override_settings(LEDGER_DASHBOARD_ROWS=2)
+    def test_dashboard_lists_latest_rows(self):
+        ledger_cache().clear()
+        for i in range(3):
+            post_transaction(self.account, Decimal("1.00"), f"Row {i}", self.user)
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "Count: 3")
+        self.assertNotContains(response, "Row 0")
+        self.assertContains(response, "Row 2")
+
+
+class SeedDataTests(TestCase):
+    def seed(self, **options):
+        call_command("seed_data", stdout=io.StringIO(), **options)
+
+    def test_default_seed_is_unchanged(self):
+        self.seed()
+        self.assertEqual(Account.objects.filter(owner__name="Test User").count(), 4)
+
+    def test_generator_produces_consistent_ledger(self):
+        self.seed(users=5, accounts_per_user=2, authorized_users=2, transactions_per_account=40, days=60, seed=7)
+        self.assertEqual(Transaction.objects.count(), 400)
+        self.assertEqual(Account.authorized_users.through.objects.count(), 20)
+        self.assertEqual(find_drift()[1], [])
+        self.assertEqual(repair_counters(), [])
+        generated = sorted(BalanceSnapshot.objects.values_list(
+            "account", "period", "period_start", "credits", "debits", "transaction_count"))
+        rebuild_snapshots()
+        self.assertEqual(sorted(BalanceSnapshot.objects.values_list(
+            "account", "period", "period_start", "credits", "debits", "transaction_count")), generated)
+
+
+class BenchmarkHelperTests(TestCase):
+    def test_benchmark_requests_reports_latency_and_queries(self):
+        user = User.objects.create(name="Test User", email="test@example.com")
+        account = Account.objects.create(name="Checking Account", owner=user)
+        url = reverse("get_transaction_history", args=[account.pk])
+        result = benchmark_requests(lambda i: self.client.get(url), requests=5, warmup=1)
+        self.assertEqual(result["requests"], 5)
+        self.assertEqual(result["max_queries"], 3)
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+    def test_benchmark_requests_fails_on_errors(self):
+        with self.assertRaises(RuntimeError):
+            benchmark_requests(lambda i: self.client.get("/api/accounts/999/"), requests=1, warmup=0)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        view_metrics.reset()
+        ledger_cache().clear()
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+
+    def test_records_queries_and_time_per_view(self):
+        self.client.get(reverse("get_transaction_history", args=[self.account.pk]))
+        stats = view_metrics.snapshot()["get_transaction_history"]
+        self.assertEqual((stats["count"], stats["queries"]), (1, 3))
+        self.assertGreater(stats["db_seconds"], 0)
+        self.assertEqual(stats["serializer_seconds"], 0)
+
+    def test_records_serializer_time_for_viewsets(self):
+        self.client.get("/api/accounts/")
+        self.assertGreater(view_metrics.snapshot()["account-list"]["serializer_seconds"], 0)
+
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse("index"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('ledger_view_duration_seconds_count{view="index"} 1', body)
+        self.assertIn('ledger_view_db_queries_total{view="index"} 3', body)
+        self.assertIn("# TYPE ledger_posting_duration_seconds summary", body)
+
+    def test_metrics_are_local_only(self):
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.5").status_code, 404)
+
+
+@override_settings(LEDGER_PROFILING_ENABLED=True, LEDGER_PROFILING_MAX_PER_MINUTE=2, LEDGER_PROFILES_KEPT=5)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profile_store.clear()
+        self.user = User.objects.create(name="Test User", email="test@example.com")
+        self.account = Account.objects.create(name="Checking Account", owner=self.user)
+        self.history = reverse("get_transaction_history", args=[self.account.pk])
+
+    def test_header_profiles_ledger_views_only(self):
+        self.client.get(self.history, HTTP_X_LEDGER_PROFILE="1")
+        self.client.get("/api/accounts/", HTTP_X_LEDGER_PROFILE="1")
+        self.client.get(reverse("admin:login"), HTTP_X_LEDGER_PROFILE="1")
+        self.client.get(self.history)
+        profiles = profile_store.all()
+        self.assertEqual([profile["view"] for profile in profiles], ["account-list", "get_transaction_history"])
+        self.assertEqual(len(profiles[1]["queries"]), 3)
+        self.assertIn("cumulative", profiles[1]["stats"])
+
+    def test_rate_limited(self):
+        for _ in range(4):
+            self.client.get(self.history, HTTP_X_LEDGER_PROFILE="1")
+        self.assertEqual(len(profile_store.all()), 2)
+
+    @override_settings(LEDGER_PROFILING_SAMPLE_RATE=1.0)
+    def test_sampling_without_header(self):
+        self.client.get(self.history)
+        self.assertEqual(len(profile_store.all()), 1)
+
+    @override_settings(LEDGER_PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.client.get(self.history, HTTP_X_LEDGER_PROFILE="1")
+        self.assertEqual(profile_store.all(), [])
+
+    def test_pages_are_staff_only(self):
+        self.client.get(self.history, HTTP_X_LEDGER_PROFILE="1")
+        profile_id = profile_store.all()[0]["id"]
+        self.assertEqual(self.client.get(reverse("profiles")).status_code, 302)
+        staff = AuthUser.objects.create_user("auditor", password="secret", is_staff=True)
+        self.client.force_login(staff)
+        self.assertContains(self.client.get(reverse("profiles")), self.history)
+        self.assertContains(self.client.get(reverse("profile_detail", args=[profile_id])), "SELECT")
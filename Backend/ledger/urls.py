@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework import routers
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r'users', views.UserViewSet)
@@ -8,6 +8,17 @@ router.register(r'accounts', views.AccountViewSet)
 router.register(r'transactions', views.TransactionViewSet)
 
 urlpatterns = [
+    # Must precede the router, which would treat "bulk" and "export" as transaction ids
+    path('api/transactions/bulk/', views.bulk_create_transactions, name='bulk_create_transactions'),
+    path('api/transactions/export/', views.export_transactions, name='export_transactions'),
+
+    # Async read paths for ASGI deployments
+    path('api/async/accounts/', async_views.accounts, name='async_accounts'),
+    path('api/async/accounts/<int:account_id>/transactions/', async_views.get_transaction_history,
+         name='async_transaction_history'),
+    path('api/async/transactions/export/', async_views.export_transactions, name='async_export_transactions'),
+    path('api/events/transactions/', async_views.transaction_events, name='transaction_events'),
+
     # API endpoints via DRF router
     path('api/', include(router.urls)),
 
@@ -17,7 +28,14 @@ urlpatterns = [
     path('api/change_balance/<int:account_id>/<str:amount>/', views.change_balance, name="change_balance"),
     path('api/transactions/create/<int:account_id>/<str:amount>/<str:description>/', views.create_transaction,
          name='create_transaction'),
-    path('api/transactions/<int:account_id>/', views.get_transaction_history, name='get_transaction_history'),
+    path('api/posting/stats/', views.posting_stats, name='posting_stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<int:profile_id>/', views.profile_detail, name='profile_detail'),
+    # api/transactions/<id>/ belongs to the router, so history lives under the account
+    path('api/accounts/<int:account_id>/transactions/', views.get_transaction_history,
+         name='get_transaction_history'),
+    path('api/accounts/<int:account_id>/summary/', views.account_summary, name='account_summary'),
     path('api/accounts/<int:account_id>/update_balance/<str:new_balance>/', views.update_balance,
          name='update_balance'),
 
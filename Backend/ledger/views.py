@@ -1,12 +1,32 @@
 from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from .archive import history_archive_slice, merge_history
+from .cache import cache_stats, cached
+from .conditional import account_condition, ledger_condition
+from .counters import transaction_count
 from .models import User, Account, Transaction
-from .serializers import UserSerializer, AccountSerializer, TransactionSerializer
+from .exports import EXPORT_FORMATS, export_rows, parse_bound, render_export
+from .idempotency import idempotent
+from .metrics import render_prometheus
+from .pagination import KeysetPagination, get_page_size, keyset_slice, split_page
+from .profiling import profile_store
+from .renderers import LedgerJsonResponse
+from .routers import primary_database
+from .serializers import UserSerializer, AccountSerializer, TransactionRowSerializer, TransactionSerializer
+from .services import (
+    BulkValidationError, amend_transaction, delete_transaction, override_balance, parse_bulk_rows,
+    post_transaction, post_transactions_bulk, posting_latency, save_account,
+)
+from .snapshots import balance_as_of, monthly_totals
 from decimal import Decimal
-from django.http import JsonResponse
-from django.utils.timezone import now
-
-from datetime import datetime
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
 
 # API viewsets using DRF
 class UserViewSet(viewsets.ModelViewSet):
@@ -14,93 +34,270 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
 
 class AccountViewSet(viewsets.ModelViewSet):
-    queryset = Account.objects.all()
+    queryset = Account.objects.prefetch_related('authorized_users')
     serializer_class = AccountSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering_field = 'created_at'
+
+    # Reads are cached until the next ledger write; account writes invalidate via post_save/post_delete
+    @method_decorator(ledger_condition)
+    def list(self, request, *args, **kwargs):
+        data = cached(
+            'account-list', lambda: super(AccountViewSet, self).list(request, *args, **kwargs).data,
+            request.build_absolute_uri(),
+        )
+        return Response(data)
+
+    @method_decorator(account_condition)
+    def retrieve(self, request, *args, **kwargs):
+        data = cached(
+            'account-detail', lambda: super(AccountViewSet, self).retrieve(request, *args, **kwargs).data,
+            kwargs['pk'],
+        )
+        return Response(data)
+
+    # The API can set balances directly, so those writes are journaled as overrides
+    def perform_create(self, serializer):
+        save_account(serializer, description="accounts API")
+
+    def perform_update(self, serializer):
+        save_account(serializer, description="accounts API")
 
 class TransactionViewSet(viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        # Lists can be thousands of rows; read plain tuples instead of building model instances
+        rows = self.filter_queryset(self.get_queryset()).values_list(*TransactionRowSerializer.fields, named=True)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(TransactionRowSerializer(rows).data)
+        return self.get_paginated_response(TransactionRowSerializer(page).data)
+
+    @method_decorator(idempotent('transactions-api'))
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance, _ = post_transaction(
+            data['account'], data['amount'], data['description'], data['creator'], data['timestamp']
+        )
+
+    def perform_update(self, serializer):
+        serializer.instance = amend_transaction(serializer.instance, **serializer.validated_data)
+
+    def perform_destroy(self, instance):
+        delete_transaction(instance)
+
+
+def get_creator(request, account):
+    """Return the ledger user matching the logged-in user, or the account owner."""
+    if request.user.is_authenticated and request.user.email:
+        creator = User.objects.filter(email=request.user.email).first()
+        if creator is not None:
+            return creator
+    return account.owner
 
+@primary_database
 def change_balance(request, account_id, amount):
     """View to change the balance of an account."""
     try:
         account = get_object_or_404(Account, id=account_id)
-        amount = Decimal(amount)
         account.change_balance(amount)  # Calls the model method to update balance
-        return JsonResponse({"status": "success", "new_balance": str(account.balance)})
+        return LedgerJsonResponse({"status": "success", "new_balance": str(account.balance)})
 
     except Exception as e:
-        return JsonResponse({"status": "error", "message": str(e)})
+        return LedgerJsonResponse({"status": "error", "message": str(e)})
 
 
 # Existing HTML views
+def load_dashboard():
+    # The latest transactions, showing only the account name, amount and description
+    latest = Transaction.objects.order_by('-id').values_list('account__name', 'amount', 'description')
+    transactions = [
+        {"account": account, "amount": amount, "description": description}
+        for account, amount, description in latest[:settings.LEDGER_DASHBOARD_ROWS]
+    ]
+    return {"transactions": transactions, "transaction_count": transaction_count()}
+
+@ledger_condition
 def index(request):
-    transactions = Transaction.objects.all()
-    context = {
-        "transactions": transactions,
-        "transaction_count": transactions.count()
-    }
-    return render(request, "ledger/index.html", context)
+    return render(request, "ledger/index.html", cached('index', load_dashboard))
 
+def load_accounts():
+    accounts = list(Account.objects.all())
+    return {"accounts": accounts, "account_count": len(accounts)}
+
+@ledger_condition
 def accounts(request):
-    accounts = Account.objects.all()
-    context = {
-        "accounts": accounts,
-        "account_count": accounts.count()
-    }
-    return render(request, "ledger/accounts.html", context)
+    return render(request, "ledger/accounts.html", cached('accounts', load_accounts))
+
+@primary_database
+@idempotent('create-transaction')
 def create_transaction(request, account_id, amount, description):
     """Create a transaction and update the account balance."""
     try:
         account = get_object_or_404(Account, id=account_id)
         amount = Decimal(amount)
 
-        # Record the transaction
-        transaction = Transaction(
-            account=account,
-            amount=amount,
-            description=description,
-            creator=request.user,  # Assuming the request user is the creator
-            timestamp=datetime.now()
-        )
-        transaction.save()
-
-        # Change the account balance
-        account.change_balance(amount)
+        # Record the transaction and update the balance in one database transaction
+        transaction, new_balance = post_transaction(account, amount, description, get_creator(request, account))
 
-        return JsonResponse({
+        return LedgerJsonResponse({
             "status": "success",
             "transaction_id": transaction.id,
-            "new_balance": str(account.balance)
+            "new_balance": str(new_balance)
         })
 
     except Exception as e:
-        return JsonResponse({"status": "error", "message": str(e)})
+        return LedgerJsonResponse({"status": "error", "message": str(e)})
 
 
-def get_transaction_history(request, account_id):
-    """Retrieve all transactions for an account."""
+@api_view(['POST'])
+@idempotent('bulk-transactions')
+def bulk_create_transactions(request):
+    """Post a JSON array or NDJSON stream of transactions in one database transaction.
+
+    A DRF view, so authentication and CSRF checks match TransactionViewSet;
+    the body is read from the raw stream rather than through DRF's parsers.
+    """
+    try:
+        rows = parse_bulk_rows(request.stream, request.content_type)
+        batch_size = int(request.query_params.get("batch_size", 0)) or None
+        created, balances = post_transactions_bulk(rows, batch_size=batch_size)
+        return LedgerJsonResponse({
+            "status": "success",
+            "created": created,
+            "balances": {str(account_id): str(balance) for account_id, balance in balances.items()},
+        })
+
+    except BulkValidationError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e), "errors": e.errors}, status=400)
+    except ValueError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e)}, status=400)
+
+
+def export_transactions(request):
+    """Stream transactions as CSV or NDJSON, optionally filtered by account and date range."""
+    export_format = request.GET.get("format", "csv")
+    try:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {export_format}")
+        account_id = request.GET.get("account")
+        rows = export_rows(
+            account_id=int(account_id) if account_id else None,
+            start=parse_bound(request.GET.get("start")),
+            end=parse_bound(request.GET.get("end"), end=True),
+        )
+    except ValueError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    response = StreamingHttpResponse(render_export(rows, export_format), content_type=EXPORT_FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+
+def account_summary(request, account_id):
+    """Report an account's balance as of a date and its monthly totals, from the snapshots."""
     account = get_object_or_404(Account, id=account_id)
-    transactions = Transaction.objects.filter(account=account).order_by('-timestamp')
-
-    transaction_list = [
-        {
-            "amount": str(tx.amount),
-            "timestamp": tx.timestamp,
-            "description": tx.description,
-            "creator": tx.creator.name,
-        }
-        for tx in transactions
-    ]
+    as_of = parse_date(request.GET.get("as_of", "")) or timezone.localdate()
+    year = request.GET.get("year")
+    months = monthly_totals(account.id, int(year) if year and year.isdigit() else None)
+
+    return LedgerJsonResponse({
+        "as_of": as_of,
+        "balance_as_of": str(balance_as_of(account.id, as_of)),
+        "months": [
+            {
+                "month": month.period_start.strftime("%Y-%m"),
+                "credits": str(month.credits),
+                "debits": str(month.debits),
+                "transaction_count": month.transaction_count,
+            }
+            for month in months
+        ],
+    })
+
+
+def posting_stats(request):
+    """Report latency percentiles for recent transaction posts."""
+    return LedgerJsonResponse({"posting": posting_latency.snapshot()})
+
+
+def metrics(request):
+    """Expose per-view and posting metrics in Prometheus text format to local scrapers."""
+    if request.META.get("REMOTE_ADDR") not in settings.LEDGER_METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        render_prometheus(posting=posting_latency.snapshot(), cache=cache_stats.snapshot()),
+        content_type="text/plain; version=0.0.4"
+    )
+
+
+@staff_member_required
+def profiles(request):
+    """List the most recent request profiles."""
+    return render(request, "ledger/profiles.html", {"profiles": profile_store.all()})
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    """Show one request profile with its query log."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise Http404
+    return render(request, "ledger/profile_detail.html", {"profile": profile})
+
+
+HISTORY_FIELDS = ('id', 'amount', 'timestamp', 'description', 'creator__name')
+
+@account_condition
+def get_transaction_history(request, account_id):
+    """Retrieve a page of an account's transactions, newest first.
+
+    Pass the returned next_cursor as ?cursor= to fetch the following page.
+    """
+    account = get_object_or_404(Account.objects.select_related('opening_balance'), id=account_id)
+    transactions = Transaction.objects.filter(account=account).values_list(*HISTORY_FIELDS, named=True)
+    cursor, limit = request.GET.get('cursor'), get_page_size(request.GET.get('limit'))
+    try:
+        rows = list(keyset_slice(transactions, cursor, limit))
+    except ValueError as e:
+        return LedgerJsonResponse({"status": "error", "message": str(e)}, status=400)
+    archived = history_archive_slice(account, rows, cursor, limit, HISTORY_FIELDS)
+    if archived is not None:
+        rows = merge_history(rows, list(archived), limit)
+
+    page, next_cursor = split_page(rows, limit)
+    return LedgerJsonResponse(history_payload(page, next_cursor))
+
+
+def history_payload(page, next_cursor):
+    """Build the transaction history response body for a page of HISTORY_FIELDS rows."""
+    return {
+        "transactions": [
+            {
+                "amount": str(tx.amount),
+                "timestamp": tx.timestamp,
+                "description": tx.description,
+                "creator": tx.creator__name,
+            }
+            for tx in page
+        ],
+        "next_cursor": next_cursor,
+    }
+
 
-    return JsonResponse({"transactions": transaction_list})
+@primary_database
 def update_balance(request, account_id, new_balance):
     """Update the balance of an account."""
     try:
         account = get_object_or_404(Account, id=account_id)
-        account.balance = Decimal(new_balance)
-        account.save()
-        return JsonResponse({"status": "success", "new_balance": str(account.balance)})
+        override_balance(account, new_balance, description="update_balance")
+        return LedgerJsonResponse({"status": "success", "new_balance": str(account.balance)})
 
     except Exception as e:
-        return JsonResponse({"status": "error", "message": str(e)})
\ No newline at end of file
+        return LedgerJsonResponse({"status": "error", "message": str(e)})
\ No newline at end of file